@@ -0,0 +1,71 @@
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import CLAIM_FIELDS
+
+User = get_user_model()
+
+
+def _changed_key(user_id):
+    return f'auth:user-changed:{user_id}'
+
+
+def mark_user_changed(user_id):
+    """
+    Flag tokens issued before now as stale. Until they expire, requests carrying them
+    load the User row instead of trusting the embedded claims.
+
+    The flag lives in the cache, which runs allkeys-lru in production: if it is evicted,
+    tokens issued before the change are trusted again until they expire, at most
+    ACCESS_TOKEN_LIFETIME. Keep that lifetime short, or give the cache a non-evicting policy.
+    """
+    timeout = int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds())
+    # iat has whole seconds, keep the fraction so a token from the same second counts as stale
+    cache.set(_changed_key(user_id), time.time(), timeout=timeout)
+
+
+class TokenClaimsUser(SimpleLazyObject):
+    """
+    request.user backed by access token claims. id, pk and the role flags are answered
+    from the token, any other attribute loads the User row on first access.
+    """
+
+    def __init__(self, user_id, token):
+        super().__init__(lambda: User.objects.get(**{api_settings.USER_ID_FIELD: user_id}))
+        self.__dict__.update({field: token[field] for field in CLAIM_FIELDS})
+        self.__dict__.update({
+            'id': user_id,
+            'pk': user_id,
+            'is_authenticated': True,
+            'is_anonymous': False,
+        })
+
+    def __bool__(self):
+        return True
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts the role claims of fresh tokens instead of querying the user"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        # tokens issued before the role claims existed, or before the user last changed
+        if any(field not in validated_token for field in CLAIM_FIELDS):
+            return super().get_user(validated_token)
+        changed_at = cache.get(_changed_key(user_id))
+        if changed_at is not None and validated_token.get('iat', 0) <= changed_at:
+            return super().get_user(validated_token)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not validated_token['is_active']:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return TokenClaimsUser(user_id, validated_token)
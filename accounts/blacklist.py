@@ -0,0 +1,123 @@
+"""
+A redis mirror of the refresh token blacklist.
+
+The mirror is one sorted set of blacklisted jtis scored by their expiry, plus a sentinel
+member added once the set was fully loaded from the database. The sentinel lives in the same
+key, so if redis evicts or loses the set the sentinel goes with it and checks fall back to
+the database until it is reloaded; a jti without the sentinel is never trusted as "not
+blacklisted". BlacklistedToken stays the source of truth.
+
+A load fills a staging key and renames it over the mirror. While it runs LOADING_KEY names
+the staging key and blacklistings are written to both, so none is lost by the rename.
+"""
+import logging
+import secrets
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_KEY = 'auth:blacklist'
+READY = '__ready__'
+LOADING_KEY = 'auth:blacklist-loading'
+LOAD_SCHEDULED_KEY = 'auth:blacklist-load-scheduled'
+
+# atomic against the rename in load_blacklist, a jti lands in the key that ends up live
+ADD_SCRIPT = """
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+local staging = redis.call('GET', KEYS[2])
+if staging then
+    redis.call('ZADD', staging, ARGV[2], ARGV[1])
+end
+"""
+
+
+def is_blacklisted(jti):
+    """True or False from the redis mirror, None when it cannot tell and the database must"""
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        listed, ready = redis.zmscore(BLACKLIST_KEY, [jti, READY])
+    except RedisError as e:
+        logger.warning(f"Blacklist check fell back to the database: {str(e)}")
+        return None
+    if ready is None:
+        schedule_blacklist_load()
+        return None
+    return listed is not None
+
+
+def add_to_blacklist(jti, exp):
+    """Mirror a blacklisting, called after the BlacklistedToken row exists"""
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        redis.eval(ADD_SCRIPT, 2, BLACKLIST_KEY, LOADING_KEY, jti, exp)
+    except RedisError as e:
+        # a mirror missing this jti must not keep its sentinel
+        logger.warning(f"Blacklist mirror dropped: {str(e)}")
+        try:
+            redis.delete(BLACKLIST_KEY)
+        except RedisError:
+            pass
+
+
+def schedule_blacklist_load():
+    from .tasks import load_token_blacklist
+
+    if cache.add(LOAD_SCHEDULED_KEY, 1, timeout=settings.TOKEN_BLACKLIST_LOAD_TIMEOUT):
+        load_token_blacklist.delay()
+
+
+def _live_blacklist(now):
+    return BlacklistedToken.objects.filter(token__expires_at__gt=now)
+
+
+def _zadd_rows(redis, key, rows):
+    pipeline = redis.pipeline(transaction=False)
+    for count, (jti, expires_at) in enumerate(rows, 1):
+        pipeline.zadd(key, {jti: expires_at.timestamp()})
+        if count % settings.TOKEN_BLACKLIST_BATCH_SIZE == 0:
+            pipeline.execute()
+    pipeline.execute()
+
+
+def load_blacklist():
+    """Rebuild the mirror from the database and swap it in with its sentinel"""
+    redis = get_redis()
+    if redis is None:
+        return 0
+    staging = f'{BLACKLIST_KEY}:loading:{secrets.token_hex(4)}'
+
+    # the staging key is not read until renamed, and expires if the load dies half way.
+    # Blacklistings from here on are written to it as well, so rows the query below misses
+    # because they commit after it started still make it in.
+    pipeline = redis.pipeline()
+    pipeline.zadd(staging, {READY: float('inf')})
+    pipeline.expire(staging, settings.TOKEN_BLACKLIST_LOAD_TIMEOUT)
+    pipeline.set(LOADING_KEY, staging, ex=settings.TOKEN_BLACKLIST_LOAD_TIMEOUT)
+    pipeline.execute()
+
+    rows = _live_blacklist(timezone.now()).values_list('token__jti', 'token__expires_at')
+    _zadd_rows(redis, staging, rows.iterator(chunk_size=settings.TOKEN_BLACKLIST_BATCH_SIZE))
+    pipeline = redis.pipeline()
+    pipeline.rename(staging, BLACKLIST_KEY)
+    pipeline.persist(BLACKLIST_KEY)
+    pipeline.delete(LOADING_KEY)
+    pipeline.execute()
+
+    cache.delete(LOAD_SCHEDULED_KEY)
+    return redis.zcard(BLACKLIST_KEY) - 1
+
+
+def prune_blacklist_mirror(now):
+    """Drop jtis that expired by now, after accounts.maintenance deleted their rows"""
+    redis = get_redis()
+    if redis is not None:
+        redis.zremrangebyscore(BLACKLIST_KEY, '-inf', now.timestamp())
@@ -0,0 +1,61 @@
+import math
+from django.db.models import Exists, F, OuterRef
+from .models import ArtisanProfile
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing the circle, clamped at the poles"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    # longitude degrees shrink towards the poles, use the edge closest to them
+    edge = min(abs(lat) + lat_delta, 89.9)
+    lng_delta = min(radius_km / (KM_PER_DEGREE * math.cos(math.radians(edge))), 180)
+    return lat - lat_delta, lat + lat_delta, lng - lng_delta, lng + lng_delta
+
+
+def nearby_artisans(lat, lng, radius_km, service_ids=None, limit=20):
+    """
+    K nearest artisans within radius_km, offering any of service_ids when given.
+    The (latitude, longitude) index narrows the scan to the bounding box and the database
+    orders by an equirectangular distance (plain arithmetic, no trig per row). The exact
+    haversine distance is only computed for the returned rows.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    queryset = ArtisanProfile.objects.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng),
+    )
+    # boxes crossing the antimeridian would need a second range, no market is near it
+
+    if service_ids:
+        queryset = queryset.filter(Exists(
+            ArtisanProfile.service.through.objects.filter(
+                artisanprofile_id=OuterRef('pk'), service_id__in=service_ids
+            )
+        ))
+
+    lng_scale = math.cos(math.radians(lat))
+    lat_offset = F('latitude') - lat
+    lng_offset = (F('longitude') - lng) * lng_scale
+    queryset = queryset.annotate(
+        planar_distance=lat_offset * lat_offset + lng_offset * lng_offset
+    ).order_by('planar_distance', 'id')
+
+    # rows in the box corners sort after everything inside the circle, the exact cut drops them
+    results = []
+    for artisan in queryset.prefetch_related('service', 'availability')[:limit]:
+        artisan.distance_km = round(haversine_km(lat, lng, artisan.latitude, artisan.longitude), 3)
+        if artisan.distance_km <= radius_km:
+            results.append(artisan)
+    return results
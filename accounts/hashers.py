@@ -0,0 +1,33 @@
+"""
+Password hashers whose cost comes from settings, see PASSWORD_HASH_PROFILE.
+
+They keep the algorithm names of the Django hashers they extend, so existing hashes still
+verify. Django rehashes a password on the next successful login whenever its stored
+parameters differ from the current ones or it was made by a hasher other than the profile's
+first, so changing the profile or its cost upgrades users as they sign in.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id, memory_cost in KiB"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,138 @@
+import json
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from core.redis import get_queue_redis
+
+PRIORITY_OTP = 'otp'
+PRIORITY_DEFAULT = 'default'
+# drained in this order, OTP mail never waits behind bulk mail
+PRIORITIES = (PRIORITY_OTP, PRIORITY_DEFAULT)
+
+
+class RedisMailQueue:
+    """
+    Outgoing mail kept in one redis list per priority.
+
+    pop_batch moves messages into a processing list instead of removing them, complete drops
+    them once sent. Messages of a drain that died in between are still there for recover().
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def _key(self, priority):
+        return f'mail:queue:{priority}'
+
+    def _processing_key(self, priority):
+        return f'mail:processing:{priority}'
+
+    def push(self, message, priority):
+        self.redis.rpush(self._key(priority), json.dumps(message))
+
+    def pending(self):
+        pipeline = self.redis.pipeline(transaction=False)
+        for priority in PRIORITIES:
+            pipeline.llen(self._key(priority))
+            pipeline.llen(self._processing_key(priority))
+        return sum(pipeline.execute())
+
+    def pop_batch(self, size):
+        batch = []
+        for priority in PRIORITIES:
+            if len(batch) >= size:
+                break
+            pipeline = self.redis.pipeline(transaction=False)
+            for _ in range(size - len(batch)):
+                pipeline.lmove(self._key(priority), self._processing_key(priority), 'LEFT', 'RIGHT')
+            batch += [(json.loads(item), priority) for item in pipeline.execute() if item is not None]
+        return batch
+
+    def complete(self, batch, failed):
+        """Drop a popped batch from processing, its failed entries back at the head of their queue"""
+        pipeline = self.redis.pipeline()
+        for message, priority in batch:
+            pipeline.lrem(self._processing_key(priority), 1, json.dumps(message))
+        for message, priority in reversed(failed):
+            pipeline.lpush(self._key(priority), json.dumps(message))
+        pipeline.execute()
+
+    def recover(self):
+        """Return messages left in processing by a drain that died to the head of their queue"""
+        recovered = 0
+        for priority in PRIORITIES:
+            while self.redis.lmove(self._processing_key(priority), self._key(priority), 'RIGHT', 'LEFT'):
+                recovered += 1
+        return recovered
+
+
+def get_mail_queue():
+    """The shared queue, or None without the queue redis since a process-local one never reaches the worker"""
+    redis = get_queue_redis()
+    return RedisMailQueue(redis) if redis is not None else None
+
+
+def send_batch(batch):
+    """
+    Send queued messages over a single SMTP connection.
+    Returns the entries that failed so the caller can put them back.
+    """
+    connection = get_connection(fail_silently=False)
+    try:
+        try:
+            connection.open()
+        except Exception:
+            # nothing was sent, the whole batch goes back
+            return batch
+        for index, (message, _) in enumerate(batch):
+            email = EmailMessage(
+                subject=message['subject'],
+                body=message['body'],
+                from_email=message['from_email'],
+                to=message['to'],
+                connection=connection,
+            )
+            try:
+                email.send()
+            except Exception:
+                # the connection is likely unusable, hand back this message and the rest
+                return batch[index:]
+    finally:
+        connection.close()
+    return []
+
+
+def build_message(subject, body, recipients):
+    return {
+        'subject': subject,
+        'body': body,
+        'from_email': settings.EMAIL_HOST_USER,
+        'to': list(recipients),
+    }
+
+
+def otp_message(user_email, otp):
+    return build_message('OTP Verification', f'Your OTP is {otp}', [user_email])
+
+
+def queue_email(subject, body, recipients, priority=PRIORITY_DEFAULT):
+    """Queue a message and make sure a drain task is on its way"""
+    from .tasks import schedule_email_drain, send_email
+
+    message = build_message(subject, body, recipients)
+    queue = get_mail_queue()
+    if queue is None:
+        send_email.delay(message)
+        return
+    queue.push(message, priority)
+    schedule_email_drain()
+
+
+def queue_otp_email(user_email, otp):
+    from .tasks import schedule_email_drain, send_otp_email
+
+    queue = get_mail_queue()
+    if queue is None:
+        send_otp_email.delay(user_email, otp)
+        return
+    queue.push(otp_message(user_email, otp), PRIORITY_OTP)
+    schedule_email_drain()
@@ -0,0 +1,33 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from core.maintenance import DeleteRowsJob, register
+from .blacklist import prune_blacklist_mirror
+from .models import OTPVerification
+
+
+@register
+class PruneOTPsJob(DeleteRowsJob):
+    """Expired codes of the database OTP store"""
+    name = 'prune_otps'
+
+    def queryset(self):
+        return OTPVerification.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=settings.OTP_TTL))
+
+
+@register
+class PruneTokensJob(DeleteRowsJob):
+    """Expired outstanding refresh tokens, their blacklist rows cascade"""
+    name = 'prune_tokens'
+
+    @property
+    def batch_size(self):
+        return settings.TOKEN_PRUNE_BATCH_SIZE
+
+    def queryset(self):
+        # expired tokens are rejected on their exp claim, listed or not
+        return OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+
+    def finish(self):
+        prune_blacklist_mirror(timezone.now())
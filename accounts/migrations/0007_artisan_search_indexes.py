@@ -0,0 +1,61 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+FTS_TABLE = 'accounts_artisanprofile_fts'
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS accounts_artisan_business_trgm ON accounts_artisanprofile '
+    'USING gin (business_name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS accounts_artisan_location_trgm ON accounts_artisanprofile '
+    'USING gin (location gin_trgm_ops)',
+]
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS accounts_artisan_business_trgm',
+    'DROP INDEX IF EXISTS accounts_artisan_location_trgm',
+]
+
+# FTS5 table keeping its own copy of the text, synced by accounts.search.sync_search_index
+# rather than triggers because SQLite table remakes in later migrations would drop them
+SQLITE_FORWARD = [
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(business_name, location)',
+    f'INSERT INTO {FTS_TABLE}(rowid, business_name, location) '
+    f'SELECT id, business_name, location FROM accounts_artisanprofile',
+]
+SQLITE_REVERSE = [
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_text_search_indexes = _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD})
+drop_text_search_indexes = _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_remove_artisanprofile_about_and_more'),
+        ('core', '0003_post_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artisanprofile',
+            index=models.Index(fields=['min_price', 'max_price'], name='accounts_artisan_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artisanprofile',
+            index=models.Index(fields=['language', 'gender', 'experience'], name='accounts_artisan_facets_idx'),
+        ),
+        migrations.RunPython(create_text_search_indexes, drop_text_search_indexes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_artisan_search_indexes'),
+        ('core', '0003_post_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='artisanprofile',
+            index=models.Index(fields=['latitude', 'longitude'], name='accounts_artisan_coords_idx'),
+        ),
+    ]
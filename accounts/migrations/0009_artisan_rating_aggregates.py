@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    ArtisanProfile = apps.get_model('accounts', 'ArtisanProfile')
+    Review = apps.get_model('core', 'Review')
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    prior_total = settings.RATING_PRIOR_MEAN * prior_weight
+    totals = Review.objects.values('artisan').annotate(total=Sum('rating'), count=Count('id'))
+    for row in totals.iterator():
+        ArtisanProfile.objects.filter(pk=row['artisan']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            rating_score=(prior_total + row['total']) / (prior_weight + row['count']),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_artisan_coordinates'),
+        ('core', '0003_post_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='rating_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='artisanprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='artisanprofile',
+            index=models.Index(fields=['-rating_score', '-id'], name='accounts_artisan_rating_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_used_codes(apps, schema_editor):
+    # verified rows were never cleaned up, codes are now deleted when used
+    OTPVerification = apps.get_model('accounts', 'OTPVerification')
+    OTPVerification.objects.filter(is_verified=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_used_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='otpverification',
+            name='is_verified',
+        ),
+        migrations.AddField(
+            model_name='otpverification',
+            name='purpose',
+            field=models.CharField(default='signup', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='otpverification',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='otpverification',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='otpverification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='otpverification',
+            constraint=models.UniqueConstraint(fields=('user', 'purpose'), name='accounts_otp_user_purpose_uniq'),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from core.models import Category, Tag, Service
-import random
 
 User = get_user_model()
 
@@ -11,6 +11,7 @@ class ClientProfile(models.Model):
     first_name = models.CharField(max_length=30, blank=True)
     last_name = models.CharField(max_length=30, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     date_of_birth = models.DateField(blank=True, null=True)
     preferred_categories = models.ManyToManyField(Category, blank=True)
     followed_tags = models.ManyToManyField(Tag, blank=True)
@@ -70,27 +71,48 @@ class ArtisanProfile(models.Model):
     location = models.CharField(max_length=100, blank=True)
     address = models.CharField(max_length=100, blank=True)
     landmark = models.CharField(max_length=100)
+    # WGS84 degrees, see accounts/geo.py for the nearby lookup
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+
+    # running review aggregates maintained by core.ratings, rebuilt by `manage.py rebuild_ratings`
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # Bayesian average, 0 until the first review
+    rating_score = models.FloatField(default=0)
 
     # files
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     certification = models.FileField(upload_to='certifications/', blank=True, null=True)
     proof_of_address = models.FileField(upload_to='proof_of_address/', blank=True, null=True)
 
     def __str__(self):
         return self.user.email
 
+    class Meta:
+        # text search indexes (trigram on Postgres, FTS5 on SQLite) are created in migration 0007
+        indexes = [
+            models.Index(fields=['min_price', 'max_price'], name='accounts_artisan_price_idx'),
+            models.Index(fields=['language', 'gender', 'experience'], name='accounts_artisan_facets_idx'),
+            models.Index(fields=['latitude', 'longitude'], name='accounts_artisan_coords_idx'),
+            models.Index(fields=['-rating_score', '-id'], name='accounts_artisan_rating_idx'),
+        ]
+
 
 class OTPVerification(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    """Pending one-time codes when redis is not available, see accounts/otp.py"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    purpose = models.CharField(max_length=20)
     otp = models.CharField(max_length=6)
-    created_at = models.DateTimeField(auto_now_add=True)
-    is_verified = models.BooleanField(default=False)
-
-
-    def generate_otp(self):
-        self.otp = ''.join([str(random.randint(0, 9)) for _ in range(4)])
-        self.save()
-        return self.otp
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # reset on every new code, expiry is counted from it
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'purpose'], name='accounts_otp_user_purpose_uniq'),
+        ]
 
 
 class AvailabilityOption(models.Model):
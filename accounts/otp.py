@@ -0,0 +1,134 @@
+"""
+One-time codes for signup verification and password reset.
+
+Codes live in redis with a native TTL when the cache is redis, and in the OTPVerification
+table otherwise. Both stores count failed attempts and burn the code after OTP_MAX_ATTEMPTS,
+and consume it on success with a single compare-and-delete, so a code verifies only once.
+Reissuing resets a code's attempts, so failures are also counted per user in the cache and
+verification is refused for OTP_FAILURE_WINDOW once they reach OTP_MAX_FAILURES.
+"""
+import secrets
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from core.redis import get_redis
+from .models import OTPVerification
+
+PURPOSE_SIGNUP = 'signup'
+PURPOSE_PASSWORD_RESET = 'password_reset'
+
+# verify_otp results
+OTP_VALID = 'valid'
+OTP_INVALID = 'invalid'
+OTP_EXPIRED = 'expired'
+OTP_LOCKED = 'locked'
+OTP_BLOCKED = 'blocked'
+
+# returns 1 and deletes the code on a match, counts the miss otherwise and deletes the code
+# once the misses reach the limit
+VERIFY = """
+local stored = redis.call('HGET', KEYS[1], 'code')
+if not stored then
+    return 0
+end
+if stored == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return 3
+end
+return 2
+"""
+VERIFY_RESULTS = {0: OTP_EXPIRED, 1: OTP_VALID, 2: OTP_INVALID, 3: OTP_LOCKED}
+
+
+def generate_code():
+    return ''.join(str(secrets.randbelow(10)) for _ in range(settings.OTP_LENGTH))
+
+
+class RedisOTPStore:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def key(self, user_id, purpose):
+        return f'otp:{purpose}:{user_id}'
+
+    def issue(self, user_id, purpose, code):
+        key = self.key(user_id, purpose)
+        # a new code replaces the old one and resets its attempts and TTL, in one round trip
+        pipeline = self.redis.pipeline()
+        pipeline.delete(key)
+        pipeline.hset(key, mapping={'code': code, 'attempts': 0})
+        pipeline.expire(key, settings.OTP_TTL)
+        pipeline.execute()
+
+    def verify(self, user_id, purpose, code):
+        result = self.redis.register_script(VERIFY)(
+            keys=[self.key(user_id, purpose)], args=[code, settings.OTP_MAX_ATTEMPTS]
+        )
+        return VERIFY_RESULTS[int(result)]
+
+
+class DatabaseOTPStore:
+    """Fallback for development without redis, one row per user and purpose"""
+
+    def issue(self, user_id, purpose, code):
+        OTPVerification.objects.update_or_create(
+            user_id=user_id, purpose=purpose,
+            defaults={'otp': code, 'attempts': 0, 'created_at': timezone.now()},
+        )
+
+    def verify(self, user_id, purpose, code):
+        live = OTPVerification.objects.filter(
+            user_id=user_id, purpose=purpose,
+            created_at__gt=timezone.now() - timedelta(seconds=settings.OTP_TTL),
+        )
+        deleted, _ = live.filter(otp=code, attempts__lt=settings.OTP_MAX_ATTEMPTS).delete()
+        if deleted:
+            return OTP_VALID
+        if not live.update(attempts=F('attempts') + 1):
+            return OTP_EXPIRED
+        locked, _ = live.filter(attempts__gte=settings.OTP_MAX_ATTEMPTS).delete()
+        return OTP_LOCKED if locked else OTP_INVALID
+
+
+def get_otp_store():
+    redis = get_redis()
+    return RedisOTPStore(redis) if redis is not None else DatabaseOTPStore()
+
+
+def issue_otp(user_id, purpose):
+    """Create a code for the user, replacing any pending one for the same purpose"""
+    code = generate_code()
+    get_otp_store().issue(user_id, purpose, code)
+    return code
+
+
+def _failures_key(user_id, purpose):
+    return f'otp:failures:{purpose}:{user_id}'
+
+
+def _record_failure(user_id, purpose):
+    key = _failures_key(user_id, purpose)
+    # the window starts at the first failure, later ones do not extend it
+    if not cache.add(key, 1, timeout=settings.OTP_FAILURE_WINDOW):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=settings.OTP_FAILURE_WINDOW)
+
+
+def verify_otp(user_id, purpose, code):
+    if (cache.get(_failures_key(user_id, purpose)) or 0) >= settings.OTP_MAX_FAILURES:
+        return OTP_BLOCKED
+
+    result = get_otp_store().verify(user_id, purpose, str(code))
+    if result == OTP_VALID:
+        cache.delete(_failures_key(user_id, purpose))
+    elif result in (OTP_INVALID, OTP_LOCKED):
+        _record_failure(user_id, purpose)
+    return result
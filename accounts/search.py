@@ -0,0 +1,128 @@
+import re
+from django.db import connection
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from .models import ArtisanProfile
+
+FTS_TABLE = 'accounts_artisanprofile_fts'
+
+
+def sync_search_index(profile):
+    """Refresh the SQLite FTS5 row of a profile, Postgres indexes the columns directly"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [profile.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, business_name, location) VALUES (%s, %s, %s)',
+            [profile.pk, profile.business_name, profile.location]
+        )
+
+
+def rebuild_search_index():
+    """Repopulate the SQLite FTS5 table, for rows written without signals (bulk_create, raw SQL)"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, business_name, location) '
+            f'SELECT id, business_name, location FROM accounts_artisanprofile'
+        )
+
+
+def remove_from_search_index(profile_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [profile_id])
+
+
+def _fts_query(text):
+    # every word as a quoted prefix term, so user input never reaches the FTS5 query syntax
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _filter_text(queryset, text):
+    """Match q against business name and location, annotating a relevance score"""
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        from django.db.models.functions import Greatest
+
+        # ILIKE is served by the trigram GIN indexes
+        return queryset.filter(
+            Q(business_name__icontains=text) | Q(location__icontains=text)
+        ).annotate(relevance=Greatest(
+            TrigramSimilarity('business_name', text),
+            TrigramSimilarity('location', text),
+        ))
+
+    if connection.vendor == 'sqlite':
+        match = _fts_query(text)
+        if not match:
+            return queryset.none()
+        # the MATCH runs once against the FTS index, bm25() only for the rows it returned
+        # (bm25 is lower for better matches)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        ).annotate(relevance=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = accounts_artisanprofile.id',
+            [match], output_field=FloatField()
+        ))
+
+    return queryset.filter(
+        Q(business_name__icontains=text) | Q(location__icontains=text)
+    ).annotate(relevance=Value(0.0))
+
+
+def search_artisans(service_ids=None, availability_ids=None, languages=None, genders=None,
+                    experience=None, min_price=None, max_price=None, location=None, q=None):
+    """
+    Filter artisans on every given facet at once.
+    Artisans offering more of the requested services come first, then the best text matches,
+    then the best rated.
+    """
+    queryset = ArtisanProfile.objects.all()
+    ordering = []
+
+    if service_ids:
+        service_through = ArtisanProfile.service.through
+        offered = service_through.objects.filter(artisanprofile_id=OuterRef('pk'), service_id__in=service_ids)
+        # EXISTS lets the planner semi-join on the through table, the count is only ranked on
+        matches = offered.values('artisanprofile_id').annotate(count=Count('*')).values('count')
+        queryset = queryset.filter(Exists(offered)).annotate(service_matches=Subquery(matches))
+        ordering.append(F('service_matches').desc())
+
+    if availability_ids:
+        availability_through = ArtisanProfile.availability.through
+        queryset = queryset.filter(Exists(
+            availability_through.objects.filter(
+                artisanprofile_id=OuterRef('pk'), availabilityoption_id__in=availability_ids
+            )
+        ))
+
+    if languages:
+        queryset = queryset.filter(language__in=languages)
+    if genders:
+        queryset = queryset.filter(gender__in=genders)
+    if experience:
+        queryset = queryset.filter(experience__in=experience)
+
+    # price ranges overlap the requested budget
+    if min_price is not None:
+        queryset = queryset.filter(max_price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(min_price__lte=max_price)
+
+    if location:
+        queryset = queryset.filter(location__icontains=location)
+
+    if q:
+        queryset = _filter_text(queryset, q)
+        ordering.append(F('relevance').desc())
+
+    # ties go to the best rated, the same order as the rating index
+    ordering += [F('rating_score').desc(), F('id').desc()]
+    return queryset.order_by(*ordering).prefetch_related('service', 'availability')
@@ -1,15 +1,25 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db import transaction
 from core.models import Category, Service
-from core.serializers import ServiceSerializer
+from core.serializers import ServiceSerializer, ImageVariantsField, HeaderOnlyImageField
+from core.tasks import rebuild_feed
+from core import registry
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import ClientProfile, ArtisanProfile, AvailabilityOption
+from .tokens import RoleRefreshToken, stamp_user_claims
 import re
 from django.core.exceptions import ValidationError
 import json
 
 User = get_user_model()
 
+VALID_CATEGORY_NAMES = frozenset(name for name, _ in Category.CATEGORY)
+
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
@@ -51,6 +61,41 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RoleRefreshToken
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RoleRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        try:
+            user = User.objects.get(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]})
+        except (KeyError, User.DoesNotExist):
+            user = None
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        # re-stamp the role claims so a role change reaches new access tokens without a re-login
+        stamp_user_claims(refresh, user)
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data["refresh"] = str(refresh)
+
+        return data
+
+
 class AvailabilityOptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = AvailabilityOption
@@ -76,14 +121,15 @@ class ClientProfileSerializer(serializers.ModelSerializer):
         many=True,
         read_only=True
     )
-    profile_picture = serializers.ImageField(required=False)
+    profile_picture = HeaderOnlyImageField(required=False)
+    profile_picture_variants = ImageVariantsField('profile_picture')
     date_of_birth = serializers.DateField(required=False, allow_null=True)
 
     class Meta:
         model = ClientProfile
         fields = [
             'first_name', 'last_name', 
-            'profile_picture', 'date_of_birth', 
+            'profile_picture', 'profile_picture_variants', 'date_of_birth', 
             'preferred_categories', 'preferred_categories_data'
             ]
 
@@ -101,15 +147,12 @@ class ClientProfileSerializer(serializers.ModelSerializer):
         if not isinstance(value, list):
             raise serializers.ValidationError("preferred_categories must be a list of category names")
 
-        # Get valid category names from Category.CATEGORY choices
-        valid_categories = [choice[0] for choice in Category.CATEGORY]
-        
         for category_name in value:
             if not isinstance(category_name, str):
                 raise serializers.ValidationError(f"Category name must be a string: {category_name}")
-            if category_name not in valid_categories:
+            if category_name not in VALID_CATEGORY_NAMES:
                 raise serializers.ValidationError(
-                    f"Invalid category: '{category_name}'. Valid options are: {valid_categories}"
+                    f"Invalid category: '{category_name}'. Valid options are: {[name for name, _ in Category.CATEGORY]}"
                 )
         return value
 
@@ -117,21 +160,23 @@ class ClientProfileSerializer(serializers.ModelSerializer):
         # Handle preferred_categories list
         preferred_categories_data = validated_data.pop('preferred_categories', None)
         
-        # Update scalar fields
-        instance.first_name = validated_data.get('first_name', instance.first_name)
-        instance.last_name = validated_data.get('last_name', instance.last_name)
-        instance.profile_picture = validated_data.get('profile_picture', instance.profile_picture)
-        instance.date_of_birth = validated_data.get('date_of_birth', instance.date_of_birth)
-        instance.save()
-
-        # Update preferred_categories if provided
-        if preferred_categories_data is not None:
-            # Clear existing categories
-            instance.preferred_categories.clear()
-            # Add new categories by name
-            for category_name in preferred_categories_data:
-                category, _ = Category.objects.get_or_create(name=category_name)
-                instance.preferred_categories.add(category)
+        with transaction.atomic():
+            # Update scalar fields, the UPDATE also row-locks the profile against concurrent updates
+            instance.first_name = validated_data.get('first_name', instance.first_name)
+            instance.last_name = validated_data.get('last_name', instance.last_name)
+            instance.profile_picture = validated_data.get('profile_picture', instance.profile_picture)
+            instance.date_of_birth = validated_data.get('date_of_birth', instance.date_of_birth)
+            instance.save()
+
+            # Update preferred_categories if provided, set() only writes the difference
+            if preferred_categories_data is not None:
+                category_ids, missing = registry.categories.resolve(preferred_categories_data)
+                # valid choices whose rows have not been created yet
+                category_ids += [Category.objects.get_or_create(name=name)[0].id for name in missing]
+                instance.preferred_categories.set(category_ids)
+                # rebuilt in the background, the request does not wait on the feed
+                client_id = instance.id
+                transaction.on_commit(lambda: rebuild_feed.delay(client_id))
 
         return instance
 
@@ -139,21 +184,30 @@ class ClientProfileSerializer(serializers.ModelSerializer):
 class ArtisanKYCSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(required=False)
     last_name = serializers.CharField(required=False)
-    profile_picture = serializers.ImageField(required=False)
+    profile_picture = HeaderOnlyImageField(required=False)
+    profile_picture_variants = ImageVariantsField('profile_picture')
     date_of_birth = serializers.DateField(required=False, allow_null=True)
     gender = serializers.ChoiceField(choices=["Male", "Female"], required=False)
     address = serializers.CharField(required=False)
     proof_of_address = serializers.FileField(required=False)
     landmark = serializers.CharField(required=False)
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
 
     class Meta:
         model = ArtisanProfile
         fields = [
             'first_name', 'last_name', 
-            'profile_picture', 'date_of_birth', 
-            'gender', 'address', 'proof_of_address', 'landmark'
+            'profile_picture', 'profile_picture_variants', 'date_of_birth', 
+            'gender', 'address', 'proof_of_address', 'landmark',
+            'latitude', 'longitude'
         ]
 
+    def validate(self, data):
+        if ('latitude' in data) != ('longitude' in data):
+            raise serializers.ValidationError("latitude and longitude must be provided together")
+        return data
+
     def update(self, instance, validated_data):
         instance.first_name = validated_data.get('first_name', instance.first_name)
         instance.last_name = validated_data.get('last_name', instance.last_name)    
@@ -163,6 +217,8 @@ class ArtisanKYCSerializer(serializers.ModelSerializer):
         instance.address = validated_data.get('address', instance.address)
         instance.proof_of_address = validated_data.get('proof_of_address', instance.proof_of_address)
         instance.landmark = validated_data.get('landmark', instance.landmark)
+        instance.latitude = validated_data.get('latitude', instance.latitude)
+        instance.longitude = validated_data.get('longitude', instance.longitude)
         instance.save()
 
         return instance
@@ -226,8 +282,7 @@ class ArtisanCutomizationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("service must be a list of service names")
 
         if value:
-            valid_service_names = set(Service.objects.values_list('name', flat=True))
-            invalid_services = [name for name in value if name not in valid_service_names]
+            invalid_services = [name for name in value if name not in registry.services]
             if invalid_services:
                 raise serializers.ValidationError(
                     f"The following service names are invalid: {', '.join(invalid_services)}"
@@ -248,8 +303,7 @@ class ArtisanCutomizationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("availability must be a list of availability names")
 
         if value:
-            valid_availability_options = set(AvailabilityOption.objects.values_list('name', flat=True))
-            invalid_availability = [name for name in value if name not in valid_availability_options]
+            invalid_availability = [name for name in value if name not in registry.availability_options]
             if invalid_availability:
                 raise serializers.ValidationError(
                     f"The following availability options are invalid: {', '.join(invalid_availability)}"
@@ -261,29 +315,119 @@ class ArtisanCutomizationSerializer(serializers.ModelSerializer):
         services_data = validated_data.pop('services', None)
         availability_option_data = validated_data.pop('availability', None)
         
-        instance.business_name = validated_data.get('business_name', instance.first_name)
-        instance.bio = validated_data.get('bio', instance.bio)
-        instance.certification = validated_data.get('certification', instance.certification)
-        instance.experience = validated_data.get('experience', instance.experience)
-        instance.business_about = validated_data.get('business_about', instance.business_about)
-        instance.language = validated_data.get('language', instance.language)
-        instance.location = validated_data.get('location', instance.location)
-        instance.min_price = validated_data.get('min_price', instance.min_price)
-        instance.max_price = validated_data.get('max_price', instance.max_price)
-        instance.save()
+        with transaction.atomic():
+            # the UPDATE also row-locks the profile against concurrent updates
+            instance.business_name = validated_data.get('business_name', instance.first_name)
+            instance.bio = validated_data.get('bio', instance.bio)
+            instance.certification = validated_data.get('certification', instance.certification)
+            instance.experience = validated_data.get('experience', instance.experience)
+            instance.business_about = validated_data.get('business_about', instance.business_about)
+            instance.language = validated_data.get('language', instance.language)
+            instance.location = validated_data.get('location', instance.location)
+            instance.min_price = validated_data.get('min_price', instance.min_price)
+            instance.max_price = validated_data.get('max_price', instance.max_price)
+            instance.save()
+
+            # set() only inserts and deletes the through rows that changed
+            if services_data is not None:
+                instance.service.set(registry.services.resolve(services_data)[0])
+
+            if availability_option_data is not None:
+                instance.availability.set(registry.availability_options.resolve(availability_option_data)[0])
+
+        return instance
 
-        if services_data is not None:
-            instance.service.clear()
-            for service_name in services_data:
-                service, _ = Service.objects.get_or_create(name=service_name)
-                instance.service.add(service)
 
-        if availability_option_data is not None:
-            instance.availability.clear()
-            for availability_name in availability_option_data:
-                availability_option, _ = AvailabilityOption.objects.get_or_create(name=availability_name)
-                instance.availability.add(availability_option)
 
-        return instance
 
+def _split_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class ArtisanSearchQuerySerializer(serializers.Serializer):
+    # list facets are comma separated, e.g. ?service=Plumbing,Tiling&language=English
+    q = serializers.CharField(required=False, max_length=100)
+    service = serializers.CharField(required=False)
+    availability = serializers.CharField(required=False)
+    language = serializers.CharField(required=False)
+    gender = serializers.CharField(required=False)
+    experience = serializers.CharField(required=False)
+    location = serializers.CharField(required=False, max_length=100)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+
+    def _validate_choices(self, value, choices, label):
+        names = _split_names(value)
+        invalid = [name for name in names if name not in choices]
+        if invalid:
+            raise serializers.ValidationError(f"Invalid {label}: {', '.join(invalid)}")
+        return names
+
+    def _resolve(self, value, names_registry, label):
+        ids, missing = names_registry.resolve(_split_names(value))
+        if missing:
+            raise serializers.ValidationError(f"Invalid {label}: {', '.join(missing)}")
+        return ids
+
+    def validate_service(self, value):
+        return self._resolve(value, registry.services, "service")
+
+    def validate_availability(self, value):
+        return self._resolve(value, registry.availability_options, "availability")
+
+    def validate_language(self, value):
+        return self._validate_choices(value, dict(ArtisanProfile.LANGUAGE), "language")
+
+    def validate_experience(self, value):
+        return self._validate_choices(value, dict(ArtisanProfile.SERVICE_YEARS), "experience")
+
+    def validate_gender(self, value):
+        genders = dict(ArtisanProfile.GENDER)
+        labels = {label: code for code, label in genders.items()}
+        names = self._validate_choices(value, {**genders, **labels}, "gender")
+        # onboarding stores the label ("Male") while the model choices use the code ("M"), match both
+        codes = {labels.get(name, name) for name in names}
+        return [form for code in codes for form in (code, genders[code])]
+
+    def validate(self, data):
+        if data.get('min_price') is not None and data.get('max_price') is not None \
+                and data['min_price'] > data['max_price']:
+            raise serializers.ValidationError("min_price cannot be greater than max_price")
+        return data
+
+
+class ArtisanSearchResultSerializer(serializers.ModelSerializer):
+    # names come from the prefetched relations, no query per artisan
+    services = serializers.SlugRelatedField(source='service', slug_field='name', many=True, read_only=True)
+    availability = serializers.SlugRelatedField(slug_field='name', many=True, read_only=True)
+    profile_picture_variants = ImageVariantsField('profile_picture')
+
+    class Meta:
+        model = ArtisanProfile
+        fields = [
+            'id', 'business_name', 'first_name', 'last_name',
+            'profile_picture', 'profile_picture_variants', 'bio', 'language', 'gender',
+            'experience', 'location', 'min_price', 'max_price',
+            'rating_score', 'rating_count', 'services', 'availability',
+        ]
+
+
+class ArtisanNearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(required=False, min_value=0.1, max_value=settings.NEARBY_MAX_RADIUS_KM)
+    service = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=settings.NEARBY_MAX_RESULTS)
+
+    def validate_service(self, value):
+        ids, missing = registry.services.resolve(_split_names(value))
+        if missing:
+            raise serializers.ValidationError(f"Invalid service: {', '.join(missing)}")
+        return ids
+
+
+class ArtisanNearbyResultSerializer(ArtisanSearchResultSerializer):
+    distance_km = serializers.FloatField(read_only=True)
 
+    class Meta(ArtisanSearchResultSerializer.Meta):
+        fields = ArtisanSearchResultSerializer.Meta.fields + ['latitude', 'longitude', 'distance_km']
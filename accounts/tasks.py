@@ -1,18 +1,86 @@
 from celery import shared_task
-from django.core.mail import send_mail
 from django.conf import settings
+from django.core.cache import cache
+from .blacklist import load_blacklist, LOAD_SCHEDULED_KEY
+from .mail import get_mail_queue, send_batch, otp_message, PRIORITY_DEFAULT, PRIORITY_OTP
 
+DRAIN_SCHEDULED_KEY = 'mail:drain-scheduled'
+DRAIN_LOCK_KEY = 'mail:drain-lock'
 
-@shared_task(bind=True, max_retries=3)
+
+def schedule_email_drain(countdown=0):
+    # at most one pending drain, the flag is cleared when the drain starts
+    if cache.add(DRAIN_SCHEDULED_KEY, 1, timeout=countdown + settings.EMAIL_DRAIN_SCHEDULE_TIMEOUT):
+        drain_email_queue.apply_async(countdown=countdown)
+
+
+@shared_task(bind=True, max_retries=8)
+def drain_email_queue(self):
+    cache.delete(DRAIN_SCHEDULED_KEY)
+    queue = get_mail_queue()
+    if queue is None:
+        return
+
+    if not cache.add(DRAIN_LOCK_KEY, 1, timeout=settings.EMAIL_DRAIN_LOCK_TIMEOUT):
+        # the running drain may already have seen an empty queue, come back after it
+        schedule_email_drain(countdown=settings.EMAIL_RETRY_BACKOFF)
+        return
+    try:
+        # only one drain runs, anything still in processing belongs to one that died
+        queue.recover()
+        while True:
+            batch = queue.pop_batch(settings.EMAIL_BATCH_SIZE)
+            if not batch:
+                return
+
+            failed = send_batch(batch)
+            queue.complete(batch, failed)
+            if failed:
+                if self.request.retries >= self.max_retries:
+                    # keep trying at the slowest pace rather than wait for the next queued message
+                    schedule_email_drain(countdown=settings.EMAIL_RETRY_BACKOFF_MAX)
+                    return
+                # exponential backoff, new mail waits for this retry instead of scheduling its own
+                countdown = min(
+                    settings.EMAIL_RETRY_BACKOFF * 2 ** self.request.retries,
+                    settings.EMAIL_RETRY_BACKOFF_MAX,
+                )
+                cache.set(DRAIN_SCHEDULED_KEY, 1, timeout=countdown + settings.EMAIL_DRAIN_SCHEDULE_TIMEOUT)
+                raise self.retry(countdown=countdown)
+    finally:
+        cache.delete(DRAIN_LOCK_KEY)
+
+
+@shared_task
+def ensure_email_drain():
+    # periodic safety net for mail left by a lost drain or a dead worker
+    queue = get_mail_queue()
+    if queue is not None and queue.pending():
+        schedule_email_drain()
+
+
+def _send_now(task, message, priority):
+    if send_batch([(message, priority)]):
+        countdown = min(settings.EMAIL_RETRY_BACKOFF * 2 ** task.request.retries, settings.EMAIL_RETRY_BACKOFF_MAX)
+        raise task.retry(countdown=countdown)
+
+
+@shared_task(bind=True, max_retries=5)
+def send_email(self, message):
+    # one message per task, used by queue_email when there is no redis for the shared queue
+    _send_now(self, message, PRIORITY_DEFAULT)
+
+
+@shared_task(bind=True, max_retries=5)
 def send_otp_email(self, user_email, otp):
+    _send_now(self, otp_message(user_email, otp), PRIORITY_OTP)
+
+
+@shared_task(bind=True, max_retries=3)
+def load_token_blacklist(self):
     try:
-        subject = "Your OTP Verification Code" 
-        send_mail(
-            'OTP Verification',
-            f'Your OTP is {otp}',
-            settings.EMAIL_HOST_USER,
-            [user_email],
-            fail_silently=False,
-        )
+        return load_blacklist()
     except Exception as e:
-        raise self.retry(exc=e, countdown=60)
\ No newline at end of file
+        # until the mirror is loaded checks keep going to the database
+        cache.delete(LOAD_SCHEDULED_KEY)
+        raise self.retry(exc=e, countdown=60)
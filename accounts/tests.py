@@ -1,3 +1,578 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.maintenance import run_job
+from core.models import Category, Service
+from core.testing import ProfiledAPITestCase, fake_redis, requires_fakeredis
+from core.throttling import redis_hit
+from quickfiss.celery import app
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from . import blacklist
+from .authentication import StatelessJWTAuthentication, TokenClaimsUser, mark_user_changed
+from .mail import PRIORITY_DEFAULT, PRIORITY_OTP, RedisMailQueue, build_message, queue_otp_email, send_batch
+from .models import ArtisanProfile, AvailabilityOption, ClientProfile, OTPVerification
+from .otp import (
+    OTP_BLOCKED, OTP_EXPIRED, OTP_INVALID, OTP_LOCKED, OTP_VALID, PURPOSE_PASSWORD_RESET, PURPOSE_SIGNUP,
+    issue_otp, verify_otp,
+)
+from .tasks import DRAIN_LOCK_KEY, drain_email_queue
+from .tokens import RoleRefreshToken
 
-# Create your tests here.
+User = get_user_model()
+
+
+def message(n):
+    return build_message(f'subject {n}', f'body {n}', [f'user{n}@example.com'])
+
+
+@requires_fakeredis
+class MailQueueTests(TestCase):
+    def setUp(self):
+        self.queue = RedisMailQueue(fake_redis())
+
+    def test_pop_batch_drains_otp_first(self):
+        self.queue.push(message(1), PRIORITY_DEFAULT)
+        self.queue.push(message(2), PRIORITY_OTP)
+        self.queue.push(message(3), PRIORITY_DEFAULT)
+
+        batch = self.queue.pop_batch(2)
+        self.assertEqual(batch, [(message(2), PRIORITY_OTP), (message(1), PRIORITY_DEFAULT)])
+        self.assertEqual(self.queue.pop_batch(10), [(message(3), PRIORITY_DEFAULT)])
+        self.assertEqual(self.queue.pop_batch(10), [])
+
+    def test_popped_until_completed(self):
+        for n in range(3):
+            self.queue.push(message(n), PRIORITY_DEFAULT)
+        batch = self.queue.pop_batch(2)
+        self.assertEqual(self.queue.pending(), 3)
+
+        self.queue.complete(batch, failed=batch[1:])
+        self.assertEqual(self.queue.pending(), 2)
+        self.assertEqual([m for m, _ in self.queue.pop_batch(10)], [message(1), message(2)])
+
+    def test_recover_after_a_dead_drain(self):
+        for n in range(3):
+            self.queue.push(message(n), PRIORITY_DEFAULT)
+        self.queue.pop_batch(2)
+
+        self.assertEqual(self.queue.recover(), 2)
+        self.assertEqual([m for m, _ in self.queue.pop_batch(10)], [message(0), message(1), message(2)])
+
+
+class SendBatchTests(TestCase):
+    def test_sends_all(self):
+        batch = [(message(n), PRIORITY_DEFAULT) for n in range(3)]
+        self.assertEqual(send_batch(batch), [])
+        self.assertEqual([m.subject for m in mail.outbox], ['subject 0', 'subject 1', 'subject 2'])
+
+    def test_open_failure_returns_whole_batch(self):
+        batch = [(message(n), PRIORITY_DEFAULT) for n in range(2)]
+        connection = mock.Mock()
+        connection.open.side_effect = OSError('connection refused')
+
+        with mock.patch('accounts.mail.get_connection', return_value=connection):
+            self.assertEqual(send_batch(batch), batch)
+        connection.close.assert_called_once()
+        self.assertEqual(mail.outbox, [])
+
+    def test_partial_failure_returns_the_rest(self):
+        batch = [(message(n), PRIORITY_DEFAULT) for n in range(3)]
+        send = mail.EmailMessage.send
+
+        def fail_second(email, *args, **kwargs):
+            if email.subject == 'subject 1':
+                raise OSError('connection reset')
+            return send(email, *args, **kwargs)
+
+        with mock.patch.object(mail.EmailMessage, 'send', fail_second):
+            self.assertEqual(send_batch(batch), batch[1:])
+        self.assertEqual([m.subject for m in mail.outbox], ['subject 0'])
+
+
+@requires_fakeredis
+class DrainTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.queue = RedisMailQueue(fake_redis())
+        patcher = mock.patch('accounts.tasks.get_mail_queue', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for n in range(3):
+            self.queue.push(message(n), PRIORITY_DEFAULT)
+
+    def test_drain_sends_everything(self):
+        drain_email_queue.apply()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_drain_resends_what_a_dead_drain_popped(self):
+        self.queue.pop_batch(2)
+        drain_email_queue.apply()
+        self.assertEqual([m.subject for m in mail.outbox], ['subject 0', 'subject 1', 'subject 2'])
+
+    def test_exhausted_retries_schedule_another_drain(self):
+        with mock.patch('accounts.tasks.send_batch', side_effect=lambda batch: batch), \
+                mock.patch('accounts.tasks.schedule_email_drain') as schedule:
+            drain_email_queue.apply(retries=drain_email_queue.max_retries)
+        schedule.assert_called_once_with(countdown=settings.EMAIL_RETRY_BACKOFF_MAX)
+        self.assertEqual(self.queue.pending(), 3)
+        self.assertIsNone(cache.get(DRAIN_LOCK_KEY))
+
+    def test_second_drain_waits_for_the_running_one(self):
+        cache.add(DRAIN_LOCK_KEY, 1)
+        with mock.patch('accounts.tasks.schedule_email_drain') as schedule:
+            drain_email_queue.apply()
+        schedule.assert_called_once_with(countdown=settings.EMAIL_RETRY_BACKOFF)
+        self.assertEqual(mail.outbox, [])
+
+
+@override_settings(QUEUE_REDIS_URL='')
+class QueueWithoutRedisTests(TestCase):
+    def setUp(self):
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    def test_otp_sent_by_task(self):
+        queue_otp_email('user@example.com', '123456')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+        self.assertIn('123456', mail.outbox[0].body)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class RegistrationTests(APITestCase):
+    def test_signup_does_not_pick_a_role(self):
+        with mock.patch('accounts.views.queue_otp_email') as queue:
+            response = self.client.post('/api/register/', {
+                'email': 'new@example.com', 'password': 'Sturdy-pass-42', 'password2': 'Sturdy-pass-42',
+                'role': 'artisan',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        queue.assert_called_once()
+
+        user = User.objects.get(email='new@example.com')
+        self.assertFalse(user.is_client or user.is_artisan)
+        self.assertFalse(ClientProfile.objects.filter(user=user).exists())
+        self.assertFalse(ArtisanProfile.objects.filter(user=user).exists())
+
+
+class StaleClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='client@example.com', password='pass', is_client=True)
+        self.auth = StatelessJWTAuthentication()
+
+    def get_user(self, token):
+        return self.auth.get_user(self.auth.get_validated_token(str(token)))
+
+    def test_fresh_token_trusts_claims(self):
+        user = self.get_user(RoleRefreshToken.for_user(self.user).access_token)
+        self.assertIs(type(user), TokenClaimsUser)
+
+    def test_change_in_the_issuing_second_makes_token_stale(self):
+        token = RoleRefreshToken.for_user(self.user).access_token
+        mark_user_changed(self.user.pk)
+        self.assertIs(type(self.get_user(token)), User)
+
+
+@requires_fakeredis
+class BlacklistMirrorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.redis = fake_redis()
+        patcher = mock.patch('accounts.blacklist.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='client@example.com', password='pass', is_client=True)
+
+    def test_blacklisting_during_a_load_survives_the_swap(self):
+        late = RoleRefreshToken.for_user(self.user)
+        zadd_rows = blacklist._zadd_rows
+
+        def blacklist_meanwhile(redis, key, rows):
+            # committed after the load read its rows, before the rename
+            zadd_rows(redis, key, rows)
+            late.blacklist()
+
+        with mock.patch('accounts.blacklist._zadd_rows', side_effect=blacklist_meanwhile):
+            blacklist.load_blacklist()
+
+        self.assertIs(blacklist.is_blacklisted(late['jti']), True)
+        self.assertIsNone(self.redis.get(blacklist.LOADING_KEY))
+
+    def test_blacklisted_token_rejected_from_the_mirror(self):
+        blacklist.load_blacklist()
+        revoked, valid = RoleRefreshToken.for_user(self.user), RoleRefreshToken.for_user(self.user)
+        revoked.blacklist()
+
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                RoleRefreshToken(str(revoked))
+            RoleRefreshToken(str(valid))
+
+    def test_falls_back_to_the_database_without_the_sentinel(self):
+        revoked = RoleRefreshToken.for_user(self.user)
+        revoked.blacklist()
+        self.redis.zrem(blacklist.BLACKLIST_KEY, blacklist.READY)
+
+        with mock.patch('accounts.tasks.load_token_blacklist.delay') as load:
+            self.assertIsNone(blacklist.is_blacklisted(revoked['jti']))
+            with self.assertRaises(TokenError):
+                RoleRefreshToken(str(revoked))
+        load.assert_called_once()
+
+    def test_load_replaces_the_mirror(self):
+        revoked = RoleRefreshToken.for_user(self.user)
+        revoked.blacklist()
+        self.redis.zadd(blacklist.BLACKLIST_KEY, {'stale-jti': 1})
+
+        self.assertEqual(blacklist.load_blacklist(), 1)
+        self.assertEqual(
+            set(self.redis.zrange(blacklist.BLACKLIST_KEY, 0, -1)),
+            {revoked['jti'].encode(), blacklist.READY.encode()},
+        )
+        self.assertIs(blacklist.is_blacklisted('stale-jti'), False)
+        self.assertIsNone(cache.get(blacklist.LOAD_SCHEDULED_KEY))
+
+    @override_settings(MAINTENANCE_BATCH_PAUSE=0)
+    def test_prune_drops_expired_tokens_and_their_mirror_entries(self):
+        expired, live = RoleRefreshToken.for_user(self.user), RoleRefreshToken.for_user(self.user)
+        expired.blacklist()
+        live.blacklist()
+        blacklist.load_blacklist()
+        past = timezone.now() - timedelta(minutes=1)
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=past)
+        self.redis.zadd(blacklist.BLACKLIST_KEY, {expired['jti']: past.timestamp()})
+
+        self.assertEqual(run_job('prune_tokens')['status'], 'done')
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        self.assertIs(blacklist.is_blacklisted(expired['jti']), False)
+        self.assertIs(blacklist.is_blacklisted(live['jti']), True)
+
+
+@override_settings(OTP_MAX_ATTEMPTS=3, OTP_MAX_FAILURES=5)
+class OTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='client@example.com', password='pass', is_client=True)
+
+    def wrong(self, code):
+        return str((int(code) + 1) % 10 ** len(code)).zfill(len(code))
+
+    def test_code_has_configured_length(self):
+        self.assertEqual(len(issue_otp(self.user.id, PURPOSE_SIGNUP)), settings.OTP_LENGTH)
+
+    def test_attempts_lock_the_code(self):
+        code = issue_otp(self.user.id, PURPOSE_SIGNUP)
+        results = [verify_otp(self.user.id, PURPOSE_SIGNUP, self.wrong(code)) for _ in range(3)]
+        self.assertEqual(results, [OTP_INVALID, OTP_INVALID, OTP_LOCKED])
+        self.assertEqual(verify_otp(self.user.id, PURPOSE_SIGNUP, code), OTP_EXPIRED)
+
+    def test_failures_survive_reissue(self):
+        for _ in range(2):
+            code = issue_otp(self.user.id, PURPOSE_SIGNUP)
+            for _ in range(3):
+                verify_otp(self.user.id, PURPOSE_SIGNUP, self.wrong(code))
+
+        code = issue_otp(self.user.id, PURPOSE_SIGNUP)
+        self.assertEqual(verify_otp(self.user.id, PURPOSE_SIGNUP, code), OTP_BLOCKED)
+        # the other purpose keeps its own count
+        code = issue_otp(self.user.id, PURPOSE_PASSWORD_RESET)
+        self.assertEqual(verify_otp(self.user.id, PURPOSE_PASSWORD_RESET, code), OTP_VALID)
+
+    def test_success_clears_failures(self):
+        code = issue_otp(self.user.id, PURPOSE_SIGNUP)
+        for _ in range(2):
+            verify_otp(self.user.id, PURPOSE_SIGNUP, self.wrong(code))
+        self.assertEqual(verify_otp(self.user.id, PURPOSE_SIGNUP, code), OTP_VALID)
+
+        for _ in range(2):
+            code = issue_otp(self.user.id, PURPOSE_SIGNUP)
+            for _ in range(2):
+                verify_otp(self.user.id, PURPOSE_SIGNUP, self.wrong(code))
+        code = issue_otp(self.user.id, PURPOSE_SIGNUP)
+        self.assertEqual(verify_otp(self.user.id, PURPOSE_SIGNUP, code), OTP_VALID)
+
+
+@requires_fakeredis
+class RedisOTPTests(OTPTests):
+    """OTPTests against RedisOTPStore, running the VERIFY script"""
+
+    def setUp(self):
+        self.redis = fake_redis()
+        patcher = mock.patch('accounts.otp.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_code_kept_in_redis_with_a_ttl(self):
+        code = issue_otp(self.user.id, PURPOSE_SIGNUP)
+        key = f'otp:{PURPOSE_SIGNUP}:{self.user.id}'
+        self.assertEqual(self.redis.hget(key, 'code'), code.encode())
+        self.assertTrue(0 < self.redis.ttl(key) <= settings.OTP_TTL)
+        self.assertFalse(OTPVerification.objects.exists())
+
+        self.assertEqual(verify_otp(self.user.id, PURPOSE_SIGNUP, code), OTP_VALID)
+        self.assertFalse(self.redis.exists(key))
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'login_ip': '100/m', 'login_email': '2/10m'},
+    },
+)
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(email='client@example.com', password='right-pass', is_client=True)
+
+    def login(self, password):
+        return self.client.post('/api/token/', {'email': 'client@example.com', 'password': password}, format='json')
+
+    def test_successful_logins_do_not_count(self):
+        for _ in range(4):
+            self.assertEqual(self.login('right-pass').status_code, 200)
+
+    def test_failed_logins_lock_the_email(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login('right-pass').status_code, 429)
+
+
+@requires_fakeredis
+class RedisLoginThrottleTests(LoginThrottleTests):
+    """LoginThrottleTests through the SLIDING_WINDOW script"""
+
+    def setUp(self):
+        self.redis = fake_redis()
+        patcher = mock.patch('core.throttling.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_failures_recorded_in_redis(self):
+        self.login('wrong')
+        keys = self.redis.keys('throttle:login:*')
+        self.assertEqual(sorted(key.decode().split(':')[2] for key in keys), ['email', 'ip'])
+
+
+@requires_fakeredis
+class SlidingWindowScriptTests(TestCase):
+    def setUp(self):
+        self.redis = fake_redis()
+
+    def hit(self, now, record=True):
+        # the module's reference only, redis keeps its own clock for expiry
+        with mock.patch('core.throttling.time') as clock:
+            clock.time.return_value = now
+            return redis_hit(self.redis, 'throttle:test', limit=2, window=60, record=record)
+
+    def test_window_slides(self):
+        self.assertEqual(self.hit(1000), 0)
+        self.assertEqual(self.hit(1030), 0)
+        # full until the first hit is 60 seconds old
+        self.assertEqual(self.hit(1045), 15)
+        self.assertEqual(self.hit(1061), 0)
+        self.assertEqual(self.redis.zcard('throttle:test'), 2)
+        self.assertTrue(0 < self.redis.pttl('throttle:test') <= 60_000)
+
+    def test_check_without_recording(self):
+        for _ in range(3):
+            self.assertEqual(self.hit(1000, record=False), 0)
+        self.assertFalse(self.redis.exists('throttle:test'))
+
+        self.hit(1000)
+        self.hit(1001)
+        self.assertEqual(self.hit(1002, record=False), 58)
+
+
+@override_settings(
+    THROTTLE_ENABLED=False, PASSWORD_ARGON2_TIME_COST=1, PASSWORD_ARGON2_MEMORY_COST=64,
+    PASSWORD_PBKDF2_ITERATIONS=1000,
+)
+class PasswordUpgradeTests(APITestCase):
+    def create_user(self, password_hash):
+        return User.objects.create(email='client@example.com', password=password_hash, is_client=True)
+
+    def login(self):
+        response = self.client.post(
+            '/api/token/', {'email': 'client@example.com', 'password': 'right-pass'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_pbkdf2_hash_upgraded_to_argon2(self):
+        user = self.create_user(PBKDF2PasswordHasher().encode('right-pass', 'somesalt', iterations=1000))
+        self.login()
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$argon2id$v=19$m=64,t=1,p=1$'))
+        self.assertTrue(user.check_password('right-pass'))
+
+    def test_argon2_hash_upgraded_to_the_tuned_cost(self):
+        with override_settings(PASSWORD_ARGON2_TIME_COST=2):
+            user = self.create_user(make_password('right-pass'))
+        self.assertIn('t=2', user.password)
+        self.login()
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('argon2$argon2id$v=19$m=64,t=1,p=1$'))
+
+
+class ProfileUpdateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Home Services')
+        Category.objects.create(name='Logistics')
+        for name in ('Plumbing', 'Tiling', 'Painting'):
+            Service.objects.create(name=name, category=category)
+        for name in ('MORNING', 'NIGHT'):
+            AvailabilityOption.objects.create(name=name)
+
+    def login(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RoleRefreshToken.for_user(user).access_token}')
+
+    def test_customization_removes_dropped_through_rows(self):
+        artisan = User.objects.create_user(email='artisan@example.com', password='pass', is_artisan=True)
+        self.login(artisan)
+        self.client.put('/api/artisan/customization/', {
+            'services': ['Plumbing', 'Tiling'], 'availability': ['MORNING', 'NIGHT'],
+        }, format='json')
+        kept = ArtisanProfile.service.through.objects.get(service__name='Tiling')
+
+        response = self.client.put('/api/artisan/customization/', {
+            'services': ['Tiling', 'Painting'], 'availability': ['NIGHT'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        profile = artisan.artisanprofile
+        self.assertEqual(sorted(profile.service.values_list('name', flat=True)), ['Painting', 'Tiling'])
+        self.assertEqual(list(profile.availability.values_list('name', flat=True)), ['NIGHT'])
+        # the unchanged row is kept rather than deleted and inserted again
+        self.assertTrue(ArtisanProfile.service.through.objects.filter(pk=kept.pk).exists())
+
+    def test_onboarding_removes_dropped_categories(self):
+        client = User.objects.create_user(email='client@example.com', password='pass', is_client=True)
+        self.login(client)
+        with mock.patch('core.tasks.rebuild_feed.delay'), self.captureOnCommitCallbacks(execute=True):
+            self.client.put('/api/client/onboarding/', {
+                'preferred_categories': ['Home Services', 'Logistics'],
+            }, format='json')
+            response = self.client.put('/api/client/onboarding/', {
+                'preferred_categories': ['Logistics'],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(client.clientprofile.preferred_categories.values_list('name', flat=True)), ['Logistics'])
+        self.assertEqual(ClientProfile.preferred_categories.through.objects.count(), 1)
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class ProfileProvisioningTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='client@example.com', password='right-pass', is_client=True)
+
+    def test_login_does_not_touch_profiles(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/token/', {'email': 'client@example.com', 'password': 'right-pass'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        profile_queries = [q['sql'] for q in queries if 'profile' in q['sql'].lower()]
+        self.assertEqual(profile_queries, [])
+
+    def test_switching_role_swaps_the_profile(self):
+        self.user.is_client, self.user.is_artisan = False, True
+        self.user.save()
+        self.assertTrue(ArtisanProfile.objects.filter(user=self.user).exists())
+        self.assertFalse(ClientProfile.objects.filter(user=self.user).exists())
+
+        self.user.is_client, self.user.is_artisan = True, False
+        self.user.save(update_fields=['is_client', 'is_artisan'])
+        self.assertTrue(ClientProfile.objects.filter(user=self.user).exists())
+        self.assertFalse(ArtisanProfile.objects.filter(user=self.user).exists())
+
+    def test_other_saves_leave_the_profile_alone(self):
+        user = User.objects.get(pk=self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            user.is_staff = True
+            user.save()
+            user.set_password('new-pass')
+            user.save(update_fields=['password'])
+        self.assertEqual([q['sql'] for q in queries if 'profile' in q['sql'].lower()], [])
+        self.assertTrue(ClientProfile.objects.filter(user=self.user).exists())
+
+    def test_dropping_every_role_removes_the_profile(self):
+        self.user.is_client = False
+        self.user.save()
+        self.assertFalse(ClientProfile.objects.filter(user=self.user).exists())
+        self.assertFalse(ArtisanProfile.objects.filter(user=self.user).exists())
+
+
+class AccountsQueryBudgetTests(ProfiledAPITestCase):
+    """Every budgeted accounts endpoint on cold caches with a stale token, its worst first request"""
+
+    def setUp(self):
+        super().setUp()
+        category = Category.objects.create(name='Home Services')
+        Category.objects.create(name='Logistics')
+        Service.objects.create(name='Plumbing', category=category)
+        Service.objects.create(name='Tiling', category=category)
+        AvailabilityOption.objects.create(name='MORNING')
+        AvailabilityOption.objects.create(name='NIGHT')
+
+        self.client_user = User.objects.create_user(email='client@example.com', password='pass', is_client=True)
+        self.artisan = User.objects.create_user(email='artisan@example.com', password='pass', is_artisan=True)
+        profile = self.artisan.artisanprofile
+        profile.latitude, profile.longitude, profile.language = 6.45, 3.39, 'English'
+        profile.save()
+        profile.service.set(Service.objects.all())
+
+    def test_client_onboarding(self):
+        self.authenticate(self.client_user, stale=True)
+        with mock.patch('core.tasks.rebuild_feed.delay') as rebuild_feed:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.put('/api/client/onboarding/', {
+                    'first_name': 'Ada', 'preferred_categories': ['Home Services', 'Logistics', 'Automotive'],
+                }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['preferred_categories_data']), 3)
+        rebuild_feed.assert_called_once_with(self.client_user.clientprofile.id)
+
+    def test_artisan_kyc(self):
+        self.authenticate(self.artisan, stale=True)
+        response = self.client.put('/api/artisan/kyc/', {
+            'first_name': 'Bola', 'gender': 'Female', 'latitude': 6.5, 'longitude': 3.4,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_artisan_customization(self):
+        self.authenticate(self.artisan, stale=True)
+        response = self.client.put('/api/artisan/customization/', {
+            'business_name': 'Bola Tiles', 'services': ['Tiling'], 'availability': ['MORNING', 'NIGHT'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(a['name'] for a in response.data['availability_data']), ['MORNING', 'NIGHT'])
+
+    def test_artisan_search(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.client.get('/api/artisans/search/', {'service': 'Plumbing', 'language': 'English'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 1)
+
+    def test_artisan_nearby(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.client.get('/api/artisans/nearby/', {'lat': 6.46, 'lng': 3.4, 'service': 'Plumbing'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 1)
@@ -0,0 +1,35 @@
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.models import User
+from .blacklist import is_blacklisted, add_to_blacklist
+
+# user flags embedded in every token so permission checks need no User query
+CLAIM_FIELDS = User.CLAIM_FIELDS
+
+
+def stamp_user_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    return token
+
+
+class RoleRefreshToken(RefreshToken):
+    """Refresh token carrying the user's role flags, copied into each access token it issues"""
+
+    @classmethod
+    def for_user(cls, user):
+        return stamp_user_claims(super().for_user(user), user)
+
+    def check_blacklist(self):
+        # the redis mirror answers the common not-blacklisted case without a query
+        listed = is_blacklisted(self.payload[api_settings.JTI_CLAIM])
+        if listed is None:
+            return super().check_blacklist()
+        if listed:
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self):
+        result = super().blacklist()
+        add_to_blacklist(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return result
@@ -1,11 +1,11 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 
 urlpatterns = [
     # auth
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', views.LoginView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('logout/', views.LogOutView.as_view(), name='logout'),
     path('register/', views.UserRegistrationView.as_view(), name='user_register'),
@@ -19,4 +19,8 @@ urlpatterns = [
     path('client/onboarding/', views.ClientOnboardingView.as_view(), name='client_onboarding'),
     path('artisan/kyc/', views.ArtisanKYCView.as_view(), name='artiisan_onboarding'),
     path('artisan/customization/', views.ArtisanCustomizationView.as_view(), name='artisan_customization'),
+
+    # discovery
+    path('artisans/search/', views.ArtisanSearchView.as_view(), name='artisan_search'),
+    path('artisans/nearby/', views.ArtisanNearbyView.as_view(), name='artisan_nearby'),
 ]
\ No newline at end of file
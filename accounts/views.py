@@ -1,22 +1,51 @@
 from django.shortcuts import render
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import  APIView
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .tokens import RoleRefreshToken
 from .serializers import (
     UserRegistrationSerializer, 
     ClientProfileSerializer, 
     ArtisanKYCSerializer,
-    ArtisanCutomizationSerializer
+    ArtisanCutomizationSerializer,
+    ArtisanSearchQuerySerializer,
+    ArtisanSearchResultSerializer,
+    ArtisanNearbyQuerySerializer,
+    ArtisanNearbyResultSerializer
 )
-from .models import OTPVerification, ClientProfile, ArtisanProfile
-from .tasks import send_otp_email
+from .models import ClientProfile, ArtisanProfile
+from .otp import (
+    issue_otp,
+    verify_otp,
+    PURPOSE_SIGNUP,
+    PURPOSE_PASSWORD_RESET,
+    OTP_VALID,
+    OTP_EXPIRED,
+    OTP_LOCKED,
+    OTP_BLOCKED
+)
+from .mail import queue_otp_email
+from .search import search_artisans
+from .geo import nearby_artisans
+from core.pagination import RankedPagination
+from core.profiling import query_budget
+from core.throttling import IPRateThrottle, EmailRateThrottle, FailedLoginThrottle
 from .permissions import IsArtisan, IsClient
 
 User = get_user_model()
 
+OTP_ERRORS = {
+    OTP_EXPIRED: "OTP has expired, please request a new one",
+    OTP_LOCKED: "Too many invalid attempts, please request a new OTP",
+    OTP_BLOCKED: "Too many invalid attempts, please try again later",
+}
+
 # Create your views here.
 
 class LogOutView(APIView):
@@ -25,7 +54,7 @@ class LogOutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data['refresh']
-            token = RefreshToken(refresh_token)
+            token = RoleRefreshToken(refresh_token)
             token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
@@ -33,20 +62,34 @@ class LogOutView(APIView):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+class LoginView(TokenObtainPairView):
+    throttle_scope = 'login'
+    throttle_classes = [IPRateThrottle, FailedLoginThrottle]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            FailedLoginThrottle().record_hit(request, self)
+            raise
+
+
 class UserRegistrationView(APIView):
     permission_classes = [AllowAny,]
+    throttle_scope = 'register'
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
 
     def post(self, request):
-        serializer = ClientRegisterSerializer(data=request.data)
+        serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
 
             # generate OTP
-            otp = OTPVerification.objects.create(user=user).generate_otp()
+            otp = issue_otp(user.id, PURPOSE_SIGNUP)
             # send OTP verification Email Asynchronously
-            send_otp_email.delay(user.email, otp)
+            queue_otp_email(user.email, otp)
 
-            refresh = RefreshToken.for_user(user)
+            refresh = RoleRefreshToken.for_user(user)
             return Response({
                 "message": "User created successfully, Kindly check your email for OTP verification",
                 "user": {"id": user.id, "email": user.email},
@@ -58,6 +101,8 @@ class UserRegistrationView(APIView):
 
 class ResendOTPView(APIView):
     permission_classes = [AllowAny,]
+    throttle_scope = 'otp'
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
 
     def post(self, request):
         email = request.data.get('email')
@@ -69,12 +114,11 @@ class ResendOTPView(APIView):
             if user.is_active:  
                 return Response({"error": "Email is already verified"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Check for existing OTP record and update it, or create a new one
-            otp_record, created = OTPVerification.objects.get_or_create(user=user)
-            otp = otp_record.generate_otp()  # Generate new OTP and update the record
+            # Replaces any pending code
+            otp = issue_otp(user.id, PURPOSE_SIGNUP)
 
             # Send OTP email asynchronously
-            send_otp_email.delay(user.email, otp)
+            queue_otp_email(user.email, otp)
 
             return Response({
                 "message": "OTP resent successfully, please check your email"
@@ -91,15 +135,14 @@ class OTPVerificationView(APIView):
         try:
             otp = request.data['otp']
             user_id = request.data['user_id']
-            user = User.objects.get(id=user_id)
-            otp_verification = OTPVerification.objects.get(user=user)
-            if otp_verification.otp == otp:
-                otp_verification.is_verified = True
-                otp_verification.save()
-                user.is_active = True
-                user.save()
+            result = verify_otp(user_id, PURPOSE_SIGNUP, otp)
+            if result == OTP_VALID:
+                user = User.objects.get(id=user_id)
+                if not user.is_active:
+                    user.is_active = True
+                    user.save(update_fields=['is_active'])
                 return Response({"message": "OTP verified successfully"}, status=status.HTTP_200_OK)
-            return Response({"message": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"message": OTP_ERRORS.get(result, "Invalid OTP")}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             print(e)
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -107,6 +150,8 @@ class OTPVerificationView(APIView):
 
 class PasswordResetRequestView(APIView):
     permission_classes = [AllowAny,]
+    throttle_scope = 'otp'
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
 
     def post(self, request):
         email = request.data.get('email')
@@ -115,12 +160,10 @@ class PasswordResetRequestView(APIView):
 
         try:
             user = User.objects.get(email=email)
-            # Check for existing OTP record and update it, or create a new one
-            otp_record, created = OTPVerification.objects.get_or_create(user=user)
-            otp = otp_record.generate_otp()
+            otp = issue_otp(user.id, PURPOSE_PASSWORD_RESET)
 
             # Send OTP email asynchronously
-            send_otp_email.delay(user.email, otp)
+            queue_otp_email(user.email, otp)
 
             return Response({
                 "message": "Password reset OTP sent successfully, please check your email"
@@ -149,22 +192,15 @@ class PasswordResetConfirmView(APIView):
 
         try:
             user = User.objects.get(email=email)
-            otp_verification = OTPVerification.objects.get(user=user)
-
-            # Check OTP validity
-            if otp_verification.otp != otp:
-                return Response({"error": "Invalid OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Check OTP expiration (10 minutes)
-            if datetime.now(otp_verification.created_at.tzinfo) > otp_verification.created_at + timedelta(minutes=10):
-                return Response({"error": "OTP has expired"}, status=status.HTTP_400_BAD_REQUEST)
+            # Check OTP validity, a valid code is used up here
+            result = verify_otp(user.id, PURPOSE_PASSWORD_RESET, otp)
+            if result != OTP_VALID:
+                return Response({"error": OTP_ERRORS.get(result, "Invalid OTP")}, status=status.HTTP_400_BAD_REQUEST)
 
             # Update password
             user.set_password(password)
-            user.save()
-
-            # Delete used OTP
-            otp_verification.delete()
+            user.save(update_fields=['password'])
 
             return Response({
                 "message": "Password reset successfully"
@@ -172,8 +208,6 @@ class PasswordResetConfirmView(APIView):
 
         except User.DoesNotExist:
             return Response({"error": "User with this email does not exist"}, status=status.HTTP_404_NOT_FOUND)
-        except OTPVerification.DoesNotExist:
-            return Response({"error": "Invalid or expired OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class ChangePasswordView(APIView):
@@ -193,13 +227,13 @@ class ChangePasswordView(APIView):
             return Response({"error": "New passwords do not match"}, status=status.HTTP_400_BAD_REQUEST)
 
         user = request.user
-        # Verify current password
-        if not user.check_password(current_password):
+        # Verify current password, without the rehash-on-login upgrade since it is replaced below
+        if not check_password(current_password, user.password):
             return Response({"error": "Current password is incorrect"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Update password
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
 
         return Response({
             "message": "Password changed successfully"
@@ -207,12 +241,13 @@ class ChangePasswordView(APIView):
 
         
 # Client Onboarding Vies
+@query_budget(15)
 class ClientOnboardingView(APIView):
     permission_classes = [IsClient,]
 
     def put(self, request):
         try:
-            profile = ClientProfile.objects.get(user=request.user)
+            profile = ClientProfile.objects.get(user_id=request.user.id)
             serializer = ClientProfileSerializer(profile, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -222,12 +257,13 @@ class ClientOnboardingView(APIView):
             return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+@query_budget(6)
 class ArtisanKYCView(APIView):
     permission_classes = [IsArtisan,]
 
     def put(self, request):
         try:
-            profile = ArtisanProfile.objects.get(user=request.user)
+            profile = ArtisanProfile.objects.get(user_id=request.user.id)
             serializer = ArtisanKYCSerializer(profile, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -237,12 +273,13 @@ class ArtisanKYCView(APIView):
             return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+@query_budget(14)
 class ArtisanCustomizationView(APIView):
     permission_classes = [IsArtisan,]
 
     def put(self, request):
         try:
-            profile = ArtisanProfile.objects.get(user=request.user)
+            profile = ArtisanProfile.objects.get(user_id=request.user.id)
             serializer = ArtisanCutomizationSerializer(profile, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -252,3 +289,52 @@ class ArtisanCustomizationView(APIView):
             return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+@query_budget(6)
+class ArtisanSearchView(APIView):
+    permission_classes = [IsAuthenticated,]
+
+    def get(self, request):
+        query = ArtisanSearchQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = query.validated_data
+        artisans = search_artisans(
+            service_ids=params.get('service'),
+            availability_ids=params.get('availability'),
+            languages=params.get('language'),
+            genders=params.get('gender'),
+            experience=params.get('experience'),
+            min_price=params.get('min_price'),
+            max_price=params.get('max_price'),
+            location=params.get('location'),
+            q=params.get('q'),
+        )
+
+        paginator = RankedPagination()
+        page = paginator.paginate_queryset(artisans, request, view=self)
+        serializer = ArtisanSearchResultSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data, "Artisans retrieved successfully")
+
+
+@query_budget(5)
+class ArtisanNearbyView(APIView):
+    permission_classes = [IsAuthenticated,]
+
+    def get(self, request):
+        query = ArtisanNearbyQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = query.validated_data
+        artisans = nearby_artisans(
+            params['lat'], params['lng'],
+            radius_km=params.get('radius', settings.NEARBY_DEFAULT_RADIUS_KM),
+            service_ids=params.get('service'),
+            limit=params.get('limit', settings.REST_FRAMEWORK['PAGE_SIZE']),
+        )
+        serializer = ArtisanNearbyResultSerializer(artisans, many=True)
+        return Response({
+            "message": "Nearby artisans retrieved successfully",
+            "data": serializer.data
+        }, status=status.HTTP_200_OK)
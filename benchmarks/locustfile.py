@@ -0,0 +1,97 @@
+"""
+Load scenario for the signup path and the read hot paths.
+
+Each simulated client registers, verifies its OTP, is made a client, completes onboarding and then
+browses its feed, categories, services and artisan search/nearby. The OTP is issued
+from the locust process, so locust must run with the same settings (and so the same
+redis, SQLite file or Postgres database) as the server under test. Every simulated user
+signs up from the same address, so the server runs with throttling off:
+
+    pip install -r benchmarks/requirements.txt
+    python manage.py seed_benchmark_data
+    THROTTLE_ENABLED=False gunicorn -c gunicorn_config.py quickfiss.wsgi   # the configuration being compared
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 \
+        --users 50 --spawn-rate 5 --run-time 2m --headless --csv results/run
+
+Locust prints requests/s and the 50/95/99th percentiles per endpoint; --csv keeps them
+for comparing releases.
+"""
+import os
+import random
+import sys
+import uuid
+
+import django
+from locust import HttpUser, between, task
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quickfiss.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from accounts.otp import issue_otp, PURPOSE_SIGNUP  # noqa: E402
+from core.benchmarks import BENCHMARK_PASSWORD  # noqa: E402
+from core.models import Category  # noqa: E402
+
+User = get_user_model()
+CATEGORIES = [name for name, _ in Category.CATEGORY]
+SEARCH_TERMS = ["plumb", "clean", "cater", "repair", "styl"]
+# (latitude, longitude) around the areas seed_benchmark_data places artisans in
+LOCATIONS = [(6.6018, 3.3515), (6.4698, 3.5852), (6.5095, 3.3711), (6.4281, 3.4219)]
+
+
+class ClientUser(HttpUser):
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        email = f'locust-{uuid.uuid4().hex}@load.quickfiss.test'
+        response = self.client.post('/api/register/', json={
+            'email': email,
+            'password': BENCHMARK_PASSWORD,
+            'password2': BENCHMARK_PASSWORD,
+        }, name='/api/register/')
+        data = response.json()
+        self.client.headers['Authorization'] = f"Bearer {data['access']}"
+
+        # the emailed code is not readable, issuing a fresh one stands in for reading the inbox
+        otp = issue_otp(data['user']['id'], PURPOSE_SIGNUP)
+        self.client.post('/api/verify-otp/', json={'user_id': data['user']['id'], 'otp': otp}, name='/api/verify-otp/')
+
+        # signup leaves the role unset, make the user a client the way an admin would and log in
+        # again so the access token carries the role
+        user = User.objects.get(id=data['user']['id'])
+        user.is_client = True
+        user.save()
+        response = self.client.post('/api/token/', json={
+            'email': email, 'password': BENCHMARK_PASSWORD,
+        }, name='/api/token/')
+        self.client.headers['Authorization'] = f"Bearer {response.json()['access']}"
+
+        self.client.put('/api/client/onboarding/', json={
+            'first_name': 'Load',
+            'last_name': 'Test',
+            'preferred_categories': random.sample(CATEGORIES, 2),
+        }, name='/api/client/onboarding/')
+
+    @task(5)
+    def feed(self):
+        self.client.get('/api/feed/', name='/api/feed/')
+
+    @task(2)
+    def search(self):
+        self.client.get(
+            '/api/artisans/search/', params={'q': random.choice(SEARCH_TERMS)}, name='/api/artisans/search/'
+        )
+
+    @task(2)
+    def nearby(self):
+        lat, lng = random.choice(LOCATIONS)
+        self.client.get('/api/artisans/nearby/', params={'lat': lat, 'lng': lng}, name='/api/artisans/nearby/')
+
+    @task(1)
+    def categories(self):
+        self.client.get('/api/categories/', name='/api/categories/')
+
+    @task(1)
+    def services(self):
+        self.client.get('/api/services/', name='/api/services/')
@@ -9,10 +9,25 @@ class ServiceAdmin(admin.ModelAdmin):
     list_filter = ('category',)
 
 
+class TagAdmin(admin.ModelAdmin):
+    search_fields = ('name',)
+
+
+class PostTagInline(admin.TabularInline):
+    model = PostTag
+    autocomplete_fields = ('tag',)
+    extra = 1
+
+
+class PostAdmin(admin.ModelAdmin):
+    inlines = [PostTagInline]
+
+
 admin.site.register(User)
 admin.site.register(Review)
 admin.site.register(Category)
-admin.site.register(Tag)
+admin.site.register(Tag, TagAdmin)
 admin.site.register(UserInteraction)
-admin.site.register(Post)
+admin.site.register(Post, PostAdmin)
+admin.site.register(FeedEntry)
 admin.site.register(Service, ServiceAdmin)
\ No newline at end of file
@@ -0,0 +1,147 @@
+import hashlib
+from functools import partial, wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from accounts.models import ClientProfile
+from accounts.permissions import IsClient
+from core.models import Category, Service
+from .serializers import CategorySerializer, ServiceSerializer, PostSerializer
+from .feed import get_client_feed
+from .pagination import KeysetPagination
+from .cache import aget_or_set_taxonomy, aget_taxonomy_version, versioned_etag, versioned_last_modified
+from .profiling import query_budget
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of APIView for read-only endpoints served under ASGI.
+    Runs the configured authentication and DRF permission classes, then the async handler.
+    """
+    authentication_class = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]
+    permission_classes = [IsAuthenticated]
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            # the stateless JWT path does not query, the thread hop only matters for stale tokens
+            auth = await sync_to_async(self.authentication_class().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        request.user, request.auth = auth if auth else (AnonymousUser(), None)
+
+        for permission_class in self.permission_classes:
+            if not permission_class().has_permission(request, self):
+                code = status.HTTP_403_FORBIDDEN if request.auth else status.HTTP_401_UNAUTHORIZED
+                return JsonResponse({"detail": "You do not have permission to perform this action."}, status=code)
+
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except NotFound as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+
+
+def taxonomy_conditional(handler):
+    """Async-aware replacement for method_decorator(condition(...)) on taxonomy handlers"""
+    @wraps(handler)
+    async def wrapper(self, request, *args, **kwargs):
+        # condition() calls its functions synchronously, read the version before so the
+        # cache is not hit from the event loop
+        version = await aget_taxonomy_version()
+        conditional = condition(
+            etag_func=lambda request, *args, **kwargs: versioned_etag(version, request),
+            last_modified_func=lambda request, *args, **kwargs: versioned_last_modified(version),
+        )
+        return await conditional(partial(handler, self))(request, *args, **kwargs)
+    return wrapper
+
+
+@query_budget(4)
+class AsyncClientPersonalizedFeed(AsyncAPIView):
+    permission_classes = [IsClient]
+
+    async def get(self, request):
+        try:
+            profile = await ClientProfile.objects.aget(user_id=request.user.id)
+        except ClientProfile.DoesNotExist:
+            return JsonResponse({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = KeysetPagination(ordering=('-created_at', '-post'), page_size=settings.FEED_PAGE_SIZE)
+        entries = await paginator.apaginate_queryset(get_client_feed(profile), request, view=self)
+        serializer = PostSerializer([entry.post for entry in entries], many=True)
+        return JsonResponse(
+            paginator.get_paginated_data(serializer.data, "Feed retrieved successfully"),
+            status=status.HTTP_200_OK
+        )
+
+
+@query_budget(2)
+class AsyncCategoryListView(AsyncAPIView):
+
+    @taxonomy_conditional
+    async def get(self, request):
+        async def build():
+            categories = [category async for category in Category.objects.all()]
+            return list(CategorySerializer(categories, many=True).data)
+
+        try:
+            categories = await aget_or_set_taxonomy('categories', build)
+            return JsonResponse({
+                "mesage": "Categories retrieved successfully",
+                "data": categories
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return JsonResponse({
+                "error": f"failed to retrieve categories {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@query_budget(3)
+class AsyncServiceListView(AsyncAPIView):
+
+    @taxonomy_conditional
+    async def get(self, request):
+        category = request.GET.get('category', None)
+        services = Service.objects.all()
+
+        try:
+            if category:
+                async def build_names():
+                    return {name async for name in Category.objects.values_list('name', flat=True)}
+
+                if category not in await aget_or_set_taxonomy('category_names', build_names):
+                    return JsonResponse({
+                        "error": f"category '{category}' does not exist"
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                services = Service.objects.filter(category__name=category)
+
+            paginator = KeysetPagination(ordering=('id',), link_params=('category',))
+            page_key = paginator.page_key(request)
+
+            async def build_page():
+                page = await paginator.apaginate_queryset(services, request, view=self)
+                serializer = ServiceSerializer(page, many=True)
+                return paginator.get_paginated_data(serializer.data, "Services retrieved successfully")
+
+            if page_key is None:
+                # later pages are not cached, see ServiceListView
+                return JsonResponse(await build_page(), status=status.HTTP_200_OK)
+            page_hash = hashlib.md5(f'{category or ""}:{page_key}'.encode('utf-8')).hexdigest()
+            return JsonResponse(
+                await aget_or_set_taxonomy(f'services:{page_hash}', build_page),
+                status=status.HTTP_200_OK
+            )
+
+        except NotFound:
+            raise
+        except Exception as e:
+            return JsonResponse({
+                "error": f"failed to retrieve services {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,52 @@
+"""
+Timing helpers shared by the benchmark_api command and benchmarks/locustfile.py reports.
+"""
+import statistics
+import time
+
+BENCHMARK_EMAIL_DOMAIN = 'bench.quickfiss.test'
+BENCHMARK_PASSWORD = 'bench-Pass-2024'
+
+
+def benchmark_email(role, index):
+    return f'{role}-{index}@{BENCHMARK_EMAIL_DOMAIN}'
+
+
+def measure(fn, iterations, warmup=0):
+    """Call fn warmup + iterations times, returning the wall time of each measured call"""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def summarize(name, latencies):
+    # quantiles() needs two points, a single sample is its own percentile
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    return {
+        'name': name,
+        'requests': len(latencies),
+        'throughput': len(latencies) / sum(latencies),
+        'p50_ms': p50 * 1000,
+        'p95_ms': p95 * 1000,
+        'p99_ms': p99 * 1000,
+    }
+
+
+def format_table(rows):
+    width = max([len(row['name']) for row in rows] + [8])
+    lines = [f"{'endpoint':<{width}}  {'req':>5}  {'req/s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}"]
+    for row in rows:
+        lines.append(
+            f"{row['name']:<{width}}  {row['requests']:>5}  {row['throughput']:>8.1f}  "
+            f"{row['p50_ms']:>8.2f}  {row['p95_ms']:>8.2f}  {row['p99_ms']:>8.2f}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,77 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+
+TAXONOMY_VERSION_KEY = 'taxonomy:version'
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_taxonomy_version():
+    """Current taxonomy version, a millisecond timestamp of the last category/service change"""
+    version = cache.get(TAXONOMY_VERSION_KEY)
+    if version is None:
+        cache.add(TAXONOMY_VERSION_KEY, _now_ms(), timeout=None)
+        version = cache.get(TAXONOMY_VERSION_KEY)
+    return version
+
+
+async def aget_taxonomy_version():
+    version = await cache.aget(TAXONOMY_VERSION_KEY)
+    if version is None:
+        await cache.aadd(TAXONOMY_VERSION_KEY, _now_ms(), timeout=None)
+        version = await cache.aget(TAXONOMY_VERSION_KEY)
+    return version
+
+
+def bump_taxonomy_version():
+    """Invalidate every cached taxonomy entry by moving to a new version"""
+    current = cache.get(TAXONOMY_VERSION_KEY) or 0
+    cache.set(TAXONOMY_VERSION_KEY, max(_now_ms(), current + 1), timeout=None)
+
+
+def get_or_set_taxonomy(name, builder):
+    """Read-through cache for taxonomy data, keyed on the current version"""
+    key = f'taxonomy:{get_taxonomy_version()}:{name}'
+    data = cache.get(key)
+    if data is None:
+        data = builder()
+        cache.set(key, data, timeout=settings.TAXONOMY_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_or_set_taxonomy(name, builder):
+    """Async variant of get_or_set_taxonomy, builder is a coroutine function"""
+    key = f'taxonomy:{await aget_taxonomy_version()}:{name}'
+    data = await cache.aget(key)
+    if data is None:
+        data = await builder()
+        await cache.aset(key, data, timeout=settings.TAXONOMY_CACHE_TIMEOUT)
+    return data
+
+
+# the query params a taxonomy response depends on, others do not change the ETag
+TAXONOMY_QUERY_PARAMS = ('category', 'cursor', 'page_size')
+
+
+def versioned_etag(version, request):
+    params = [(name, request.GET.get(name, '')) for name in TAXONOMY_QUERY_PARAMS]
+    request_hash = hashlib.md5(f'{request.path}?{urlencode(params)}'.encode('utf-8')).hexdigest()
+    return f'{version}-{request_hash}'
+
+
+def versioned_last_modified(version):
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+def taxonomy_etag(request, *args, **kwargs):
+    return versioned_etag(get_taxonomy_version(), request)
+
+
+def taxonomy_last_modified(request, *args, **kwargs):
+    return versioned_last_modified(get_taxonomy_version())
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from accounts.models import ClientProfile
+from .models import FeedEntry, Post, PostTag
+
+
+def _matching_posts(profile):
+    category_ids = list(profile.preferred_categories.values_list('id', flat=True))
+    tag_ids = list(profile.followed_tags.values_list('id', flat=True))
+
+    if not category_ids and not tag_ids:
+        return Post.objects.none()
+
+    # a subquery on the (tag, post) index rather than a join, posts with several
+    # followed tags come back once
+    return Post.objects.filter(
+        Q(category_id__in=category_ids)
+        | Q(id__in=PostTag.objects.filter(tag_id__in=tag_ids).values('post_id'))
+    )
+
+
+def _matching_client_ids(post):
+    query = Q()
+    if post.category_id:
+        query |= Q(preferred_categories=post.category_id)
+    tag_ids = list(PostTag.objects.filter(post=post).values_list('tag_id', flat=True))
+    if tag_ids:
+        query |= Q(followed_tags__in=tag_ids)
+
+    if not query:
+        return set()
+    return set(ClientProfile.objects.filter(query).values_list('id', flat=True).distinct())
+
+
+def fanout_post(post):
+    """Add a post to the feed of every client it matches and drop it from the rest"""
+    client_ids = _matching_client_ids(post)
+
+    with transaction.atomic():
+        existing_ids = set(
+            FeedEntry.objects.filter(post=post).values_list('client_id', flat=True)
+        )
+        stale_ids = existing_ids - client_ids
+        if stale_ids:
+            FeedEntry.objects.filter(post=post, client_id__in=stale_ids).delete()
+
+        added_ids = client_ids - existing_ids
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(client_id=client_id, post=post, created_at=post.created_at)
+                for client_id in added_ids
+            ],
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        trim_client_feeds(added_ids)
+
+
+def trim_client_feeds(client_ids):
+    """Drop the entries past FEED_MAX_ENTRIES from these clients' feeds, oldest first"""
+    client_ids = sorted(client_ids)
+    for start in range(0, len(client_ids), settings.FEED_TRIM_BATCH_SIZE):
+        ranked = FeedEntry.objects.filter(
+            client_id__in=client_ids[start:start + settings.FEED_TRIM_BATCH_SIZE]
+        ).annotate(rank=Window(
+            RowNumber(),
+            partition_by=F('client_id'),
+            order_by=[F('created_at').desc(), F('post_id').desc()],
+        ))
+        overflow = list(ranked.filter(rank__gt=settings.FEED_MAX_ENTRIES).values_list('id', flat=True))
+        if overflow:
+            FeedEntry.objects.filter(id__in=overflow).delete()
+
+
+def rebuild_client_feed(profile):
+    """Recompute a client's feed from their current preferences, newest posts first"""
+    posts = (
+        _matching_posts(profile)
+        .order_by('-created_at', '-id')
+        .values_list('id', 'created_at')[:settings.FEED_MAX_ENTRIES]
+    )
+
+    with transaction.atomic():
+        FeedEntry.objects.filter(client=profile).delete()
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(client=profile, post_id=post_id, created_at=created_at)
+                for post_id, created_at in posts
+            ],
+            batch_size=settings.FEED_BATCH_SIZE,
+        )
+
+
+def get_client_feed(profile):
+    return (
+        FeedEntry.objects.filter(client=profile)
+        .select_related('post', 'post__category')
+        .prefetch_related('post__tags')
+        .order_by('-created_at', '-post_id')
+    )
@@ -0,0 +1,159 @@
+import base64
+import os
+from io import BytesIO
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# model label -> (image field, variants field, widths setting)
+IMAGE_FIELDS = {
+    'core.Post': ('image', 'image_variants', 'POST_IMAGE_WIDTHS'),
+    'accounts.ClientProfile': ('profile_picture', 'profile_picture_variants', 'AVATAR_IMAGE_WIDTHS'),
+    'accounts.ArtisanProfile': ('profile_picture', 'profile_picture_variants', 'AVATAR_IMAGE_WIDTHS'),
+}
+
+# formats a re-encoded original may keep, anything else is stored as JPEG
+ORIGINAL_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+
+def needs_processing(instance):
+    """True when the instance's image changed since its variants were generated"""
+    field_name, variants_field, _ = IMAGE_FIELDS[instance._meta.label]
+    image = getattr(instance, field_name)
+    return bool(image) and getattr(instance, variants_field).get('source') != image.name
+
+
+def _encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, image_format, optimize=True, **options)
+    return buffer.getvalue()
+
+
+def _flatten(image):
+    # JPEG has no alpha channel, composite transparent images onto white
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _resize(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _lqip(image):
+    """Tiny blurred WebP as a data URI, inlined in the response so clients can paint before download"""
+    thumbnail = _resize(image, min(settings.IMAGE_LQIP_WIDTH, image.width))
+    data = _encode(thumbnail, 'WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(data).decode('ascii')
+
+
+def build_variants(field_file, widths):
+    """
+    Write a copy of the original re-encoded without EXIF (orientation applied, capped at
+    IMAGE_MAX_DIMENSION) and a WebP and a JPEG copy per width. Returns the variants description,
+    whose source is the new copy; the original is left for the caller to delete.
+    """
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        image = Image.open(source)
+        original_format = image.format if image.format in ORIGINAL_FORMATS else 'JPEG'
+        # rotate pixels per the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    image.thumbnail((settings.IMAGE_MAX_DIMENSION, settings.IMAGE_MAX_DIMENSION), Image.Resampling.LANCZOS)
+    if original_format == 'JPEG':
+        image = _flatten(image)
+
+    # Pillow only writes EXIF when asked to, re-encoding strips it. The original is kept until
+    # the field points at the copy
+    name = storage.save(field_file.name, ContentFile(_encode(image, original_format, quality=90)))
+
+    flat = _flatten(image)
+    root, _ = os.path.splitext(name)
+    variants = []
+    # always at least one variant, never upscaled
+    for width in sorted({min(width, flat.width) for width in widths}):
+        resized = _resize(flat, width)
+        variants.append({
+            'width': resized.width,
+            'height': resized.height,
+            'webp': storage.save(
+                f'{root}_{width}w.webp',
+                ContentFile(_encode(resized, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY))
+            ),
+            'jpeg': storage.save(
+                f'{root}_{width}w.jpg',
+                ContentFile(_encode(resized, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY, progressive=True))
+            ),
+        })
+
+    return {
+        'source': name,
+        'width': image.width,
+        'height': image.height,
+        'lqip': _lqip(flat),
+        'variants': variants,
+    }
+
+
+def delete_variants(storage, data):
+    for variant in data.get('variants', []):
+        storage.delete(variant['webp'])
+        storage.delete(variant['jpeg'])
+
+
+def process_instance_image(model_label, pk):
+    """Generate variants for one instance, skipping work already done for its current image"""
+    model = apps.get_model(model_label)
+    field_name, variants_field, widths_setting = IMAGE_FIELDS[model_label]
+    instance = model.objects.filter(pk=pk).only('pk', field_name, variants_field).first()
+    if instance is None or not needs_processing(instance):
+        return None
+
+    field_file = getattr(instance, field_name)
+    previous = getattr(instance, variants_field)
+    data = build_variants(field_file, getattr(settings, widths_setting))
+
+    # a queryset update sends no post_save, so this does not schedule itself again;
+    # the name guard skips the write if the image was replaced while we worked
+    updated = model.objects.filter(pk=pk, **{field_name: field_file.name}).update(**{
+        field_name: data['source'],
+        variants_field: data,
+    })
+    if not updated:
+        delete_variants(field_file.storage, data)
+        if data['source'] != field_file.name:
+            field_file.storage.delete(data['source'])
+        return None
+
+    delete_variants(field_file.storage, previous)
+    # a storage that overwrites on save (S3 by default) rewrote the original in place
+    if data['source'] != field_file.name:
+        field_file.storage.delete(field_file.name)
+    return data
+
+
+def variant_urls(storage, data):
+    """Variants description with storage names turned into URLs"""
+    if not data.get('variants'):
+        return None
+    return {
+        'width': data['width'],
+        'height': data['height'],
+        'lqip': data['lqip'],
+        'variants': [
+            {
+                'width': variant['width'],
+                'height': variant['height'],
+                'webp': storage.url(variant['webp']),
+                'jpeg': storage.url(variant['jpeg']),
+            }
+            for variant in data['variants']
+        ],
+    }
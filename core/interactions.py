@@ -0,0 +1,141 @@
+import logging
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from redis.exceptions import RedisError
+from .models import Post, UserInteraction
+from .redis import get_queue_redis
+
+logger = logging.getLogger(__name__)
+
+VIEW = 'view'
+LIKE = 'like'
+UNLIKE = 'unlike'
+EVENT_TYPES = (VIEW, LIKE, UNLIKE)
+
+User = get_user_model()
+
+
+class RedisInteractionBuffer:
+    """
+    Interaction events appended to a redis stream in the noeviction queue redis. The stream is
+    not capped, when that redis is full pushes fail and record_interactions writes them itself.
+    """
+    key = 'interactions:stream'
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def push(self, events):
+        # one round trip for the whole request
+        pipeline = self.redis.pipeline(transaction=False)
+        for user_id, post_id, event in events:
+            pipeline.xadd(self.key, {'user': user_id, 'post': post_id, 'event': event})
+        pipeline.execute()
+
+    def read_batch(self, size):
+        entries = self.redis.xrange(self.key, count=size)
+        ids = [entry_id for entry_id, _ in entries]
+        events = [
+            (int(fields[b'user']), int(fields[b'post']), fields[b'event'].decode())
+            for _, fields in entries
+        ]
+        return ids, events
+
+    def ack(self, ids):
+        # deleted only once written, a failed flush replays the batch
+        if ids:
+            self.redis.xdel(self.key, *ids)
+
+
+def get_interaction_buffer():
+    """The shared buffer, or None without the queue redis since a process-local one never reaches the worker"""
+    redis = get_queue_redis()
+    return RedisInteractionBuffer(redis) if redis is not None else None
+
+
+def record_interactions(user_id, events):
+    """Buffer (post_id, event) pairs for a user and make sure a flush is on its way"""
+    from .tasks import schedule_interaction_flush
+
+    events = [(user_id, post_id, event) for post_id, event in events]
+    buffer = get_interaction_buffer()
+    if buffer is not None:
+        try:
+            buffer.push(events)
+            schedule_interaction_flush()
+            return
+        except RedisError as e:
+            logger.warning(f"Interaction buffer unavailable, writing inline: {str(e)}")
+    # nothing to hand over to the worker, write them now
+    write_interactions(coalesce(events))
+
+
+def coalesce(events):
+    """
+    Collapse events to one state per (user, post), in arrival order.
+    liked is None when the batch never touched it, so the upsert leaves the stored value alone.
+    """
+    states = {}
+    for user_id, post_id, event in events:
+        state = states.setdefault((user_id, post_id), {'viewed': False, 'liked': None})
+        if event == VIEW:
+            state['viewed'] = True
+        elif event == LIKE:
+            # liking a post implies having seen it
+            state['liked'] = True
+            state['viewed'] = True
+        elif event == UNLIKE:
+            state['liked'] = False
+    return states
+
+
+def write_interactions(states):
+    """Upsert coalesced states, grouped by the columns each one actually changes"""
+    user_ids = set(User.objects.filter(id__in={user_id for user_id, _ in states}).values_list('id', flat=True))
+    post_ids = set(Post.objects.filter(id__in={post_id for _, post_id in states}).values_list('id', flat=True))
+
+    groups = {}
+    for (user_id, post_id), state in states.items():
+        # events for deleted users or posts are dropped rather than failing the batch
+        if user_id not in user_ids or post_id not in post_ids:
+            continue
+        update_fields = ['interaction_date']
+        if state['viewed']:
+            update_fields.append('viewed')
+        if state['liked'] is not None:
+            update_fields.append('liked')
+        groups.setdefault(tuple(update_fields), []).append(UserInteraction(
+            user_id=user_id,
+            post_id=post_id,
+            viewed=state['viewed'],
+            liked=bool(state['liked']),
+        ))
+
+    written = 0
+    for update_fields, rows in groups.items():
+        UserInteraction.objects.bulk_create(
+            rows,
+            batch_size=settings.INTERACTION_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'post'],
+            update_fields=list(update_fields),
+        )
+        written += len(rows)
+    return written
+
+
+def flush_buffer(buffer=None):
+    """
+    Drain the buffer batch by batch, returning the number of rows written. Callers hold
+    FLUSH_LOCK_KEY, two flushes reading the same entries would write them out of order.
+    """
+    buffer = buffer or get_interaction_buffer()
+    if buffer is None:
+        return 0
+    written = 0
+    while True:
+        ids, events = buffer.read_batch(settings.INTERACTION_BATCH_SIZE)
+        if not events:
+            return written
+        written += write_interactions(coalesce(events))
+        buffer.ack(ids)
@@ -0,0 +1,186 @@
+"""
+Periodic maintenance jobs, run by celery beat through core.tasks.run_maintenance.
+
+A job does its work in bounded batches. After each batch the runner stores the job's cursor,
+so a run that hits MAINTENANCE_TIME_BUDGET (or dies) resumes where it stopped instead of
+starting over, and sleeps MAINTENANCE_BATCH_PAUSE so the deletes never hold hot tables for
+long. A cache lock keeps one run of a job at a time across workers. Jobs must stay
+idempotent: an evicted cursor restarts the job and an expired lock can let a second run in.
+
+Apps declare jobs in a maintenance.py module with @register; `manage.py maintenance` shows
+their progress and runs them by hand.
+"""
+import logging
+import secrets
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+from accounts.models import ArtisanProfile
+from .cache import get_or_set_taxonomy
+from .models import Category, UserInteraction
+from .ratings import rebuild_ratings_batch
+from .serializers import CategorySerializer
+
+logger = logging.getLogger(__name__)
+
+_jobs = {}
+_discovered = False
+
+
+def register(job_class):
+    _jobs[job_class.name] = job_class
+    return job_class
+
+
+def get_jobs():
+    global _discovered
+    if not _discovered:
+        autodiscover_modules('maintenance')
+        _discovered = True
+    return _jobs
+
+
+def get_job(name):
+    try:
+        return get_jobs()[name]()
+    except KeyError:
+        raise ValueError(f"Unknown maintenance job {name!r}")
+
+
+class MaintenanceJob:
+    name = None
+
+    @property
+    def batch_size(self):
+        return settings.MAINTENANCE_BATCH_SIZE
+
+    def run_batch(self, cursor):
+        """Do one bounded unit of work after cursor, returning (rows handled, next cursor or None when done)"""
+        raise NotImplementedError
+
+    def finish(self):
+        """Called once the last batch is done"""
+
+
+class DeleteRowsJob(MaintenanceJob):
+    """Deletes queryset() in primary key order, batch_size rows per statement"""
+
+    def queryset(self):
+        raise NotImplementedError
+
+    def run_batch(self, cursor):
+        rows = self.queryset()
+        if cursor is not None:
+            rows = rows.filter(pk__gt=cursor)
+        ids = list(rows.order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+        if not ids:
+            return 0, None
+        # only('pk') keeps the cascade collector from loading whole rows
+        rows.model._base_manager.filter(pk__in=ids).only('pk').delete()
+        return len(ids), ids[-1]
+
+
+def _key(name, part):
+    return f'maintenance:{name}:{part}'
+
+
+def get_status(name):
+    return {
+        'running': cache.get(_key(name, 'lock')) is not None,
+        'progress': cache.get(_key(name, 'progress')),
+        'last_run': cache.get(_key(name, 'last-run')),
+    }
+
+
+def reset_progress(name):
+    cache.delete(_key(name, 'progress'))
+
+
+def run_job(name):
+    """
+    Run a job until it is done or out of time budget. Returns a dict whose status is
+    'done', 'partial' (call again to resume) or 'locked' (another run holds the job).
+    """
+    job = get_job(name)
+    lock_key, progress_key = _key(name, 'lock'), _key(name, 'progress')
+    token = secrets.token_hex(8)
+    if not cache.add(lock_key, token, timeout=settings.MAINTENANCE_LOCK_TIMEOUT):
+        logger.info(f"Maintenance job {name} is already running")
+        return {'job': name, 'status': 'locked'}
+
+    try:
+        progress = cache.get(progress_key) or {
+            'cursor': None, 'processed': 0, 'batches': 0, 'started_at': timezone.now().isoformat(),
+        }
+        deadline = time.monotonic() + settings.MAINTENANCE_TIME_BUDGET
+        while True:
+            processed, cursor = job.run_batch(progress['cursor'])
+            progress.update(
+                cursor=cursor,
+                processed=progress['processed'] + processed,
+                batches=progress['batches'] + 1,
+                updated_at=timezone.now().isoformat(),
+            )
+
+            if cursor is None:
+                job.finish()
+                last_run = {
+                    'started_at': progress['started_at'],
+                    'finished_at': progress['updated_at'],
+                    'processed': progress['processed'],
+                    'batches': progress['batches'],
+                }
+                cache.set(_key(name, 'last-run'), last_run, timeout=None)
+                cache.delete(progress_key)
+                logger.info(f"Maintenance job {name} done, {progress['processed']} rows")
+                return {'job': name, 'status': 'done', **last_run}
+
+            cache.set(progress_key, progress, timeout=None)
+            cache.touch(lock_key, settings.MAINTENANCE_LOCK_TIMEOUT)
+            if time.monotonic() >= deadline:
+                return {'job': name, 'status': 'partial', **progress}
+            time.sleep(settings.MAINTENANCE_BATCH_PAUSE)
+    finally:
+        # a run that outlived its lock must not release the next run's
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+@register
+class PruneInteractionsJob(DeleteRowsJob):
+    """Interactions untouched for INTERACTION_RETENTION_DAYS"""
+    name = 'prune_interactions'
+
+    def queryset(self):
+        # walks the primary key rather than indexing interaction_date, which the upserts rewrite
+        cutoff = timezone.now() - timedelta(days=settings.INTERACTION_RETENTION_DAYS)
+        return UserInteraction.objects.filter(interaction_date__lt=cutoff)
+
+
+@register
+class RecomputeRatingsJob(MaintenanceJob):
+    """Rebuilds the rating aggregates from the reviews, correcting any drift of the incremental updates"""
+    name = 'recompute_ratings'
+
+    def run_batch(self, cursor):
+        return rebuild_ratings_batch(ArtisanProfile.objects.all(), cursor, self.batch_size)
+
+
+@register
+class WarmCachesJob(MaintenanceJob):
+    """Fills the shared taxonomy entries so the first request after a change or eviction is not a miss"""
+    name = 'warm_caches'
+
+    def run_batch(self, cursor):
+        get_or_set_taxonomy(
+            'categories',
+            lambda: list(CategorySerializer(Category.objects.all(), many=True).data)
+        )
+        get_or_set_taxonomy(
+            'category_names',
+            lambda: set(Category.objects.values_list('name', flat=True))
+        )
+        return 2, None
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from accounts.models import ArtisanProfile, ClientProfile
+from accounts.search import search_artisans
+from accounts.serializers import ArtisanSearchResultSerializer
+from core.benchmarks import BENCHMARK_EMAIL_DOMAIN, format_table, measure, summarize
+from core.models import Post
+from accounts.tokens import RoleRefreshToken
+from core.serializers import PostSerializer
+import json
+import logging
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and p50/p95/p99 latency of the API hot paths and their serializers "
+        "against the data from seed_benchmark_data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--base-url",
+            help="Send the requests to a running server (e.g. http://127.0.0.1:8000) instead of in process",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        client_profile = ClientProfile.objects.filter(
+            user__email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}', feed_entries__isnull=False
+        ).select_related('user').first()
+        artisan = ArtisanProfile.objects.filter(
+            user__email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}', latitude__isnull=False
+        ).first()
+        if client_profile is None or artisan is None:
+            raise CommandError("No benchmark data, run seed_benchmark_data first")
+
+        token = str(RoleRefreshToken.for_user(client_profile.user).access_token)
+        post_id = Post.objects.filter(artisan=artisan).values_list('id', flat=True).first()
+        if options['base_url']:
+            send = self._http(options['base_url'], token)
+        else:
+            send = self._in_process(token)
+
+        endpoints = [
+            ("GET feed", lambda: send('GET', '/api/feed/')),
+            ("GET categories", lambda: send('GET', '/api/categories/')),
+            ("GET services", lambda: send('GET', '/api/services/')),
+            ("GET artisan posts", lambda: send('GET', f'/api/artisans/{artisan.id}/posts/')),
+            ("GET artisan search", lambda: send('GET', '/api/artisans/search/?q=plumb&gender=M&min_price=1000')),
+            (
+                "GET artisans nearby",
+                lambda: send('GET', f'/api/artisans/nearby/?lat={artisan.latitude}&lng={artisan.longitude}&radius=5'),
+            ),
+            (
+                "POST interactions",
+                lambda: send('POST', '/api/interactions/', {'events': [{'post': post_id, 'type': 'view'}]}),
+            ),
+        ]
+
+        posts = list(
+            Post.objects.select_related('artisan', 'category').prefetch_related('tags').order_by('-id')[:20]
+        )
+        artisans = list(search_artisans(q='plumb')[:20])
+        serializers = [
+            ("PostSerializer x20", lambda: PostSerializer(posts, many=True).data),
+            ("ArtisanSearchResultSerializer x20", lambda: ArtisanSearchResultSerializer(artisans, many=True).data),
+        ]
+
+        try:
+            results = [
+                summarize(name, measure(fn, options['iterations'], options['warmup']))
+                for name, fn in endpoints + serializers
+            ]
+        except Exception as e:
+            logger.error(f"Error in command: {str(e)}")
+            raise CommandError(f"Error running benchmarks: {str(e)}")
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(format_table(results))
+
+    def _in_process(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        # the test client sends "testserver"; profiling would add its own work to every request
+        override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], PROFILING_ENABLED=False
+        ).enable()
+
+        def send(method, path, data=None):
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.post(path, data, format='json')
+            if response.status_code >= 400:
+                raise CommandError(f"{method} {path} returned {response.status_code}")
+            return response
+
+        return send
+
+    def _http(self, base_url, token):
+        def send(method, path, data=None):
+            request = urllib.request.Request(
+                base_url.rstrip('/') + path,
+                method=method,
+                data=json.dumps(data).encode() if data is not None else None,
+                headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'},
+            )
+            with urllib.request.urlopen(request) as response:
+                return response.read()
+
+        return send
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+import math
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Report password verifications per second on one core for each PASSWORD_HASH_PROFILES entry, "
+        "to size web workers against a target login rate"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            action="append",
+            choices=list(settings.PASSWORD_HASH_PROFILES),
+            help="Profile to measure, may be repeated (default: all)",
+        )
+        parser.add_argument("--seconds", type=float, default=3.0, help="Measuring time per profile")
+        parser.add_argument("--target-logins", type=float, help="Logins per second the workers must sustain")
+        # try candidate costs without changing the environment
+        parser.add_argument("--time-cost", type=int)
+        parser.add_argument("--memory-cost", type=int, help="Argon2 memory in KiB")
+        parser.add_argument("--parallelism", type=int)
+        parser.add_argument("--iterations", type=int, help="PBKDF2 iterations")
+
+    def handle(self, *args, **options):
+        overrides = {
+            setting: options[option]
+            for setting, option in [
+                ('PASSWORD_ARGON2_TIME_COST', 'time_cost'),
+                ('PASSWORD_ARGON2_MEMORY_COST', 'memory_cost'),
+                ('PASSWORD_ARGON2_PARALLELISM', 'parallelism'),
+                ('PASSWORD_PBKDF2_ITERATIONS', 'iterations'),
+            ]
+            if options[option] is not None
+        }
+
+        self.stdout.write(
+            f"{'profile':<10}  {'parameters':<36}  {'ms/hash':>8}  {'hashes/s/core':>13}"
+            + (f"  {'cores needed':>12}" if options['target_logins'] else '')
+        )
+        with override_settings(**overrides):
+            for profile in options['profile'] or settings.PASSWORD_HASH_PROFILES:
+                hasher = import_string(settings.PASSWORD_HASH_PROFILES[profile][0])()
+                try:
+                    seconds_per_hash = self.measure(hasher, options['seconds'])
+                except Exception as e:
+                    # argon2 rejects some parameter combinations, e.g. memory below 8 * parallelism
+                    raise CommandError(f"Error benchmarking {profile}: {str(e)}")
+
+                rate = 1 / seconds_per_hash
+                line = f"{profile:<10}  {self.describe(hasher):<36}  {seconds_per_hash * 1000:>8.1f}  {rate:>13.1f}"
+                if options['target_logins']:
+                    # a sync worker verifies one password at a time, one per core
+                    line += f"  {math.ceil(options['target_logins'] / rate):>12}"
+                self.stdout.write(line)
+
+    def measure(self, hasher, seconds):
+        # a login is one verify against the stored hash
+        encoded = hasher.encode('benchmark-password', hasher.salt())
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds or count == 0:
+            hasher.verify('benchmark-password', encoded)
+            count += 1
+        return (time.perf_counter() - started) / count
+
+    def describe(self, hasher):
+        if hasattr(hasher, 'memory_cost'):
+            return (
+                f"{hasher.algorithm} t={hasher.time_cost} m={hasher.memory_cost}KiB p={hasher.parallelism}"
+            )
+        return f"{hasher.algorithm} iterations={hasher.iterations}"
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.maintenance import get_jobs, get_status, reset_progress, run_job
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Show the progress of the periodic maintenance jobs, or run some of them now"
+
+    def add_arguments(self, parser):
+        parser.add_argument("jobs", nargs="*", help="Jobs to run until done (default: show status only)")
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Discard the saved cursor so the jobs start over",
+        )
+
+    def handle(self, *args, **options):
+        jobs = get_jobs()
+        unknown = [name for name in options['jobs'] if name not in jobs]
+        if unknown:
+            raise CommandError(f"Unknown jobs: {', '.join(unknown)}. Available: {', '.join(sorted(jobs))}")
+
+        if not options['jobs']:
+            for name in sorted(jobs):
+                status = get_status(name)
+                self.stdout.write(
+                    f"{name}: running={status['running']} progress={status['progress']} last_run={status['last_run']}"
+                )
+            return
+
+        try:
+            for name in options['jobs']:
+                if options['reset']:
+                    reset_progress(name)
+                # unlike the celery task, keep going past the time budget until the job is done
+                result = run_job(name)
+                while result['status'] == 'partial':
+                    result = run_job(name)
+                self.stdout.write(self.style.SUCCESS(f"{name}: {result}"))
+
+        except Exception as e:
+            logger.error(f"Error in command: {str(e)}")
+            raise CommandError(f"Error running maintenance: {str(e)}")
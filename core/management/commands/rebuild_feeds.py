@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import ClientProfile
+from core.feed import rebuild_client_feed
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized personalized feed of every client"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--client",
+            type=int,
+            help="Only rebuild the feed of the client profile with this id",
+        )
+
+    def handle(self, *args, **options):
+        profiles = ClientProfile.objects.all()
+        if options['client']:
+            profiles = profiles.filter(id=options['client'])
+
+        try:
+            count = 0
+            for profile in profiles.iterator():
+                rebuild_client_feed(profile)
+                count += 1
+
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} feeds'))
+
+        except Exception as e:
+            logger.error(f"Error in command: {str(e)}")
+            raise CommandError(f"Error rebuilding feeds: {str(e)}")
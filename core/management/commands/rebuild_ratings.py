@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import ArtisanProfile
+from core.ratings import rebuild_ratings_batch
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized rating aggregates of every artisan from their reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--artisan",
+            type=int,
+            help="Only rebuild the artisan profile with this id",
+        )
+
+    def handle(self, *args, **options):
+        artisans = ArtisanProfile.objects.all()
+        if options['artisan']:
+            artisans = artisans.filter(id=options['artisan'])
+
+        try:
+            count = 0
+            rebuilt, last_id = rebuild_ratings_batch(artisans)
+            while last_id is not None:
+                count += rebuilt
+                rebuilt, last_id = rebuild_ratings_batch(artisans, last_id)
+
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings of {count} artisans'))
+
+        except Exception as e:
+            logger.error(f"Error in command: {str(e)}")
+            raise CommandError(f"Error rebuilding ratings: {str(e)}")
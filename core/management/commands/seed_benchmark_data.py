@@ -0,0 +1,219 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.models import ArtisanProfile, ClientProfile, AvailabilityOption
+from accounts.search import rebuild_search_index
+from core.benchmarks import BENCHMARK_EMAIL_DOMAIN, BENCHMARK_PASSWORD, benchmark_email
+from core.feed import rebuild_client_feed
+from core.models import Category, Service, Tag, Post, PostTag, Review, UserInteraction
+from core.ratings import rebuild_ratings
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+BUSINESS_WORDS = ["Ace", "Prime", "Swift", "Royal", "Golden", "Bright", "Express", "Elite", "Classic", "Modern"]
+TRADES = ["Plumbing", "Electricals", "Cleaning", "Catering", "Repairs", "Styling", "Logistics", "Motors"]
+# (area, latitude, longitude) around Lagos
+AREAS = [
+    ("Ikeja", 6.6018, 3.3515), ("Lekki", 6.4698, 3.5852), ("Yaba", 6.5095, 3.3711),
+    ("Surulere", 6.5000, 3.3500), ("Ikorodu", 6.6194, 3.5105), ("Victoria Island", 6.4281, 3.4219),
+    ("Ajah", 6.4667, 3.5667), ("Festac", 6.4667, 3.2833),
+]
+TAG_NAMES = [f"{trade.lower()}-{word.lower()}" for trade in TRADES for word in ("tips", "deals", "pros")]
+
+
+class Command(BaseCommand):
+    help = "Generate a reproducible data set for benchmark_api and benchmarks/locustfile.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--artisans", type=int, default=2000)
+        parser.add_argument("--clients", type=int, default=1000)
+        parser.add_argument("--posts-per-artisan", type=int, default=3)
+        parser.add_argument("--reviews", type=int, default=5000)
+        parser.add_argument("--interactions", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously generated benchmark users (and everything cascading from them) first",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+
+        try:
+            if options['clear']:
+                deleted, _ = User.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').delete()
+                self.stdout.write(f"Deleted {deleted} benchmark rows")
+
+            if not Service.objects.exists():
+                call_command('create_categories_and_services', stdout=self.stdout)
+            for name in ('MORNING', 'AFTERNOON', 'NIGHT'):
+                AvailabilityOption.objects.get_or_create(name=name)
+
+            # bulk inserts skip the model signals, the derived data is rebuilt at the end
+            with transaction.atomic():
+                artisans = self._create_artisans(options['artisans'])
+                clients = self._create_clients(options['clients'])
+                posts = self._create_posts(artisans, options['posts_per_artisan'])
+                self._create_reviews(clients, artisans, options['reviews'])
+                self._create_interactions(clients, posts, options['interactions'])
+
+            rebuild_ratings()
+            rebuild_search_index()
+            for profile in clients:
+                rebuild_client_feed(profile)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Generated {len(artisans)} artisans, {len(clients)} clients and {len(posts)} posts "
+                f"(password '{BENCHMARK_PASSWORD}')"
+            ))
+
+        except Exception as e:
+            logger.error(f"Error in command: {str(e)}")
+            raise CommandError(f"Error generating benchmark data: {str(e)}")
+
+    def _create_users(self, role, count):
+        offset = User.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}', **{f'is_{role}': True}).count()
+        # hashing is the slow part of create_user, every benchmark user shares one hash
+        password = make_password(BENCHMARK_PASSWORD)
+        users = User.objects.bulk_create(
+            [
+                User(email=benchmark_email(role, offset + index), password=password, **{f'is_{role}': True})
+                for index in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return users
+
+    def _create_artisans(self, count):
+        services = list(Service.objects.values_list('id', flat=True))
+        availability = list(AvailabilityOption.objects.values_list('id', flat=True))
+        languages = [code for code, _ in ArtisanProfile.LANGUAGE]
+        years = [code for code, _ in ArtisanProfile.SERVICE_YEARS]
+
+        profiles = []
+        for user in self._create_users('artisan', count):
+            area, latitude, longitude = self.random.choice(AREAS)
+            min_price = self.random.randrange(5, 200) * 100
+            profiles.append(ArtisanProfile(
+                user=user,
+                business_name=f"{self.random.choice(BUSINESS_WORDS)} {self.random.choice(TRADES)}",
+                business_about="Benchmark artisan",
+                bio="Benchmark artisan",
+                language=self.random.choice(languages),
+                experience=self.random.choice(years),
+                gender=self.random.choice(["Male", "Female"]),
+                min_price=min_price,
+                max_price=min_price + self.random.randrange(1, 50) * 100,
+                location=f"{area}, Lagos",
+                landmark=area,
+                latitude=latitude + self.random.uniform(-0.03, 0.03),
+                longitude=longitude + self.random.uniform(-0.03, 0.03),
+            ))
+        profiles = ArtisanProfile.objects.bulk_create(profiles, batch_size=BATCH_SIZE)
+
+        service_links, availability_links = [], []
+        for profile in profiles:
+            for service_id in self.random.sample(services, min(len(services), self.random.randint(1, 4))):
+                service_links.append(ArtisanProfile.service.through(artisanprofile_id=profile.id, service_id=service_id))
+            for option_id in self.random.sample(availability, self.random.randint(1, len(availability))):
+                availability_links.append(
+                    ArtisanProfile.availability.through(artisanprofile_id=profile.id, availabilityoption_id=option_id)
+                )
+        ArtisanProfile.service.through.objects.bulk_create(service_links, batch_size=BATCH_SIZE)
+        ArtisanProfile.availability.through.objects.bulk_create(availability_links, batch_size=BATCH_SIZE)
+        return profiles
+
+    def _create_clients(self, count):
+        categories = list(Category.objects.values_list('id', flat=True))
+        tags = self._tags()
+
+        profiles = ClientProfile.objects.bulk_create(
+            [ClientProfile(user=user, first_name="Bench") for user in self._create_users('client', count)],
+            batch_size=BATCH_SIZE,
+        )
+        category_links, tag_links = [], []
+        for profile in profiles:
+            for category_id in self.random.sample(categories, min(len(categories), 2)):
+                category_links.append(
+                    ClientProfile.preferred_categories.through(clientprofile_id=profile.id, category_id=category_id)
+                )
+            for tag_id in self.random.sample(tags, 3):
+                tag_links.append(ClientProfile.followed_tags.through(clientprofile_id=profile.id, tag_id=tag_id))
+        ClientProfile.preferred_categories.through.objects.bulk_create(category_links, batch_size=BATCH_SIZE)
+        ClientProfile.followed_tags.through.objects.bulk_create(tag_links, batch_size=BATCH_SIZE)
+        return profiles
+
+    def _tags(self):
+        existing = set(Tag.objects.filter(name__in=TAG_NAMES).values_list('name', flat=True))
+        Tag.objects.bulk_create([Tag(name=name) for name in TAG_NAMES if name not in existing])
+        return list(Tag.objects.filter(name__in=TAG_NAMES).values_list('id', flat=True))
+
+    def _create_posts(self, artisans, per_artisan):
+        categories = list(Category.objects.values_list('id', flat=True))
+        tags = self._tags()
+
+        posts = Post.objects.bulk_create(
+            [
+                Post(
+                    artisan=artisan,
+                    image='services/benchmark.jpg',
+                    job_title=f"{self.random.choice(TRADES)} job",
+                    description="Benchmark post",
+                    category_id=self.random.choice(categories),
+                    price=self.random.randrange(5, 500) * 100,
+                )
+                for artisan in artisans
+                for _ in range(per_artisan)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        PostTag.objects.bulk_create(
+            [
+                PostTag(post=post, tag_id=tag_id)
+                for post in posts
+                for tag_id in self.random.sample(tags, 2)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return posts
+
+    def _create_reviews(self, clients, artisans, count):
+        if not clients or not artisans:
+            return
+        Review.objects.bulk_create(
+            [
+                Review(
+                    client=self.random.choice(clients),
+                    artisan=self.random.choice(artisans),
+                    rating=self.random.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 5, 6])[0],
+                    comment="Benchmark review",
+                )
+                for _ in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    def _create_interactions(self, clients, posts, count):
+        if not clients or not posts:
+            return
+        UserInteraction.objects.bulk_create(
+            [
+                UserInteraction(
+                    user_id=self.random.choice(clients).user_id,
+                    post=self.random.choice(posts),
+                    viewed=True,
+                    liked=self.random.random() < 0.2,
+                )
+                for _ in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_remove_artisanprofile_about_and_more'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='accounts.clientprofile')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='core.post')),
+            ],
+            options={
+                'verbose_name_plural': 'Feed entries',
+                'indexes': [models.Index(fields=['client', '-created_at', '-post'], name='core_feed_client_recent_idx')],
+                'unique_together': {('client', 'post')},
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+import re
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_post_tags(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    Tag = apps.get_model('core', 'Tag')
+    PostTag = apps.get_model('core', 'PostTag')
+
+    # names are matched case-insensitively, so "Plumbing" and "#plumbing" link the same Tag
+    tag_ids = {name.lower(): pk for pk, name in Tag.objects.values_list('pk', 'name')}
+    links = []
+    for post_id, text in Post.objects.values_list('id', 'tags_text').iterator():
+        names = {tag.strip()[:50] for tag in re.split(r'[,#]', text or '') if tag.strip()}
+        for name in names:
+            if name.lower() not in tag_ids:
+                tag_ids[name.lower()] = Tag.objects.create(name=name).pk
+        links += [PostTag(post_id=post_id, tag_id=tag_ids[name.lower()]) for name in names]
+
+    PostTag.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+
+
+def restore_tags_text(apps, schema_editor):
+    Post = apps.get_model('core', 'Post')
+    PostTag = apps.get_model('core', 'PostTag')
+
+    names = {}
+    for post_id, name in PostTag.objects.values_list('post_id', 'tag__name').order_by('id'):
+        names.setdefault(post_id, []).append(name)
+    for post_id, tags in names.items():
+        Post.objects.filter(pk=post_id).update(tags_text=', '.join(tags)[:100])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='post',
+            old_name='tags',
+            new_name='tags_text',
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='tags_text',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'post'], name='core_posttag_tag_post_idx')],
+                'unique_together': {('post', 'tag')},
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='posts', through='core.PostTag', to='core.tag'),
+        ),
+        migrations.RunPython(backfill_post_tags, restore_tags_text),
+        migrations.RemoveField(
+            model_name='post',
+            name='tags_text',
+        ),
+    ]
@@ -39,9 +39,42 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
+    # fields whose changes require profile provisioning, see core.signals
+    ROLE_FIELDS = ('is_client', 'is_artisan')
+    # fields embedded in access tokens, see accounts.tokens
+    CLAIM_FIELDS = ROLE_FIELDS + ('is_active',)
+
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_claims = instance._current_claims()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_claims = self._current_claims()
+
+    def _current_claims(self):
+        # read from __dict__ so deferred fields are not fetched
+        return tuple(self.__dict__.get(field) for field in self.CLAIM_FIELDS)
+
+    def changed_claims(self, update_fields=None):
+        """Names of CLAIM_FIELDS changed since the row was loaded or last saved"""
+        loaded = getattr(self, '_loaded_claims', None)
+        if loaded is None:
+            changed = set(self.CLAIM_FIELDS)
+        else:
+            changed = {
+                field for field, old, new in zip(self.CLAIM_FIELDS, loaded, self._current_claims())
+                if old != new
+            }
+        if update_fields is not None:
+            changed &= set(update_fields)
+        return changed
+
 
 
 class Service(models.Model):
@@ -60,6 +93,20 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = instance._current_rating()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_rating = self._current_rating()
+
+    def _current_rating(self):
+        # (artisan_id, rating) as last persisted, core.ratings applies the difference
+        return self.__dict__.get('artisan_id'), self.__dict__.get('rating')
+
     def __str__(self):
         return f"Review by {self.client.get_full_name()} for {self.artisan.get_full_name()}"
 
@@ -67,16 +114,44 @@ class Review(models.Model):
 class Post(models.Model):
     artisan = models.ForeignKey('accounts.ArtisanProfile', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='services/')  # Fixed typo: iamge -> image
+    # resized WebP/JPEG copies and a placeholder, written by core.images
+    image_variants = models.JSONField(default=dict, blank=True)
     job_title = models.CharField(max_length=100)
     description = models.TextField()
     category = models.ForeignKey('Category', on_delete=models.CASCADE, null=True)
-    tags = models.CharField(max_length=100)
+    tags = models.ManyToManyField('Tag', through='PostTag', related_name='posts', blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_category_id = self.__dict__.get('category_id')
+
+    def category_changed(self, update_fields=None):
+        """Whether the category changed since the row was loaded or last saved, True when unknown"""
+        if update_fields is not None and not {'category', 'category_id'} & set(update_fields):
+            return False
+        if not hasattr(self, '_loaded_category_id'):
+            return True
+        return self.__dict__.get('category_id') != self._loaded_category_id
+
     def __str__(self):
         return f"{self.job_title} by {self.artisan.get_full_name()}"
 
+    class Meta:
+        # (created_at, id) keysets used by KeysetPagination and the feed rebuild
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='core_post_recent_idx'),
+            models.Index(fields=['artisan', '-created_at', '-id'], name='core_post_artisan_recent_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='core_post_category_recent_idx'),
+        ]
+
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -85,6 +160,18 @@ class Tag(models.Model):
         return self.name
 
 
+class PostTag(models.Model):
+    # inverted tag -> post index, the feed looks posts up by followed tag ids
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('post', 'tag')
+        indexes = [
+            models.Index(fields=['tag', 'post'], name='core_posttag_tag_post_idx'),
+        ]
+
+
 class Category(models.Model):
     CATEGORY = (
         ("Automotive", "Automotive"),
@@ -113,4 +200,20 @@ class UserInteraction(models.Model):
     interaction_date = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ('user', 'post')
\ No newline at end of file
+        unique_together = ('user', 'post')
+
+class FeedEntry(models.Model):
+    # materialized copy of a client's personalized feed, kept in sync by core.feed
+    client = models.ForeignKey('accounts.ClientProfile', related_name='feed_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='feed_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('client', 'post')
+        indexes = [
+            models.Index(fields=['client', '-created_at', '-post'], name='core_feed_client_recent_idx'),
+        ]
+        verbose_name_plural = 'Feed entries'
+
+    def __str__(self):
+        return f"{self.post_id} in feed of {self.client_id}"
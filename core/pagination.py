@@ -0,0 +1,147 @@
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the full ordering tuple instead of using OFFSET.
+    The ordering must end in a unique field so every row has a distinct position.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None, page_size=None, link_params=None):
+        if ordering is not None:
+            self.ordering = ordering
+        if page_size is not None:
+            self.page_size = page_size
+        # for pages cached across requests: relative next links that keep only these params
+        self.link_params = link_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._set_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self._set_page([obj async for obj in self._page_queryset(queryset, request)])
+
+    def _bind(self, queryset, request):
+        self.request = request
+        self.fields = [
+            (queryset.model._meta.get_field(name.lstrip('-')), name.startswith('-'))
+            for name in self.ordering
+        ]
+
+    def page_key(self, request):
+        """
+        The page size a first page request asks for, the same for every equivalent request.
+        None past the first page: cursors come from the client, caching their pages would let
+        anyone mint cache entries.
+        """
+        if self.get_query_params(request).get(self.cursor_query_param):
+            return None
+        return str(self.get_page_size(request))
+
+    def _page_queryset(self, queryset, request):
+        self._bind(queryset, request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+
+        # one extra row tells us whether there is a next page
+        self.current_page_size = self.get_page_size(request)
+        return queryset[:self.current_page_size + 1]
+
+    def _set_page(self, results):
+        self.has_next = len(results) > self.current_page_size
+        self.page = results[:self.current_page_size]
+        return self.page
+
+    def _after(self, position):
+        # (a, b) after (x, y)  <=>  a > x OR (a = x AND b > y), flipped for descending fields
+        query = Q()
+        equal = {}
+        for (field, descending), value in zip(self.fields, position):
+            lookup = 'lt' if descending else 'gt'
+            query |= Q(**equal, **{f'{field.attname}__{lookup}': value})
+            equal[field.attname] = value
+        return query
+
+    def get_query_params(self, request):
+        # plain Django requests (async views) have no query_params
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(self.get_query_params(request)[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = self.get_query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for (field, _), value in zip(self.fields, values)]
+        except (binascii.Error, UnicodeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field, _ in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.page[-1])
+        if self.link_params is None:
+            return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+        query = self.get_query_params(self.request)
+        params = {name: query[name] for name in self.link_params if name in query}
+        if self.current_page_size != self.page_size:
+            params[self.page_size_query_param] = self.current_page_size
+        params[self.cursor_query_param] = cursor
+        return f'{self.request.path}?{urlencode(params)}'
+
+    def get_paginated_data(self, data, message=None):
+        body = {"message": message} if message else {}
+        body.update({"next": self.get_next_link(), "data": data})
+        return body
+
+    def get_paginated_response(self, data, message=None):
+        return Response(self.get_paginated_data(data, message))
+
+
+class RankedPagination(PageNumberPagination):
+    """Page numbers for ranked results (search), where a keyset on the score is not stable"""
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+    def get_paginated_data(self, data, message=None):
+        body = {"message": message} if message else {}
+        body.update({"count": self.page.paginator.count, "next": self.get_next_link(), "data": data})
+        return body
+
+    def get_paginated_response(self, data, message=None):
+        return Response(self.get_paginated_data(data, message))
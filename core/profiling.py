@@ -0,0 +1,167 @@
+"""
+Per-request query count, DB time, serializer time and total time.
+
+ProfilingMiddleware exports them as a Server-Timing header and one JSON log line per
+request (logger "core.profiling"). Views declare how many queries they may run with
+@query_budget(n); going over logs a warning, or raises QueryBudgetExceeded when
+QUERY_BUDGET_STRICT is set, which is how core.testing fails tests on N+1 regressions.
+A budget covers the worst first request: cold caches and registries, and a stale token
+whose claims make authentication load the User row.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+# the running request's stats, carried into sync_to_async threads with the context
+_current = ContextVar('request_profile', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Class or function view decorator declaring the most queries one request may run"""
+    def decorate(view):
+        view.query_budget = limit
+        return view
+    return decorate
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.started = time.perf_counter()
+        self.view = None
+        self.budget = None
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serializer_time * 1000:.1f}, '
+            f'total;dur={self.total_time * 1000:.1f}'
+        )
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'queries': self.queries,
+            'query_budget': self.budget,
+            'db_ms': round(self.db_time * 1000, 1),
+            'serializer_ms': round(self.serializer_time * 1000, 1),
+            'total_ms': round(self.total_time * 1000, 1),
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _install_serializer_timer():
+    # every top-level .data access goes through BaseSerializer.data, nested fields do not
+    data = BaseSerializer.data
+    if getattr(data.fget, 'profiled', False):
+        return
+
+    def timed_data(self):
+        profile = _current.get()
+        if profile is None or profile.serializing:
+            return data.fget(self)
+        profile.serializing = True
+        started = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            profile.serializing = False
+            profile.serializer_time += time.perf_counter() - started
+
+    timed_data.profiled = True
+    BaseSerializer.data = property(timed_data)
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        # the timer replaces BaseSerializer.data for the whole process, leave it alone unless profiling
+        if settings.PROFILING_ENABLED:
+            _install_serializer_timer()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+
+        token = _current.set(RequestProfile())
+        try:
+            return self.finish(request, self.get_response(request))
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+
+        token = _current.set(RequestProfile())
+        try:
+            return self.finish(request, await self.get_response(request))
+        finally:
+            _current.reset(token)
+
+    def finish(self, request, response):
+        profile = _current.get()
+        # read from the resolver match rather than process_view, which ASGI would run in a thread
+        if request.resolver_match is not None:
+            view = getattr(request.resolver_match.func, 'view_class', request.resolver_match.func)
+            profile.view = f'{view.__module__}.{view.__qualname__}'
+            profile.budget = getattr(view, 'query_budget', None)
+
+        response['Server-Timing'] = profile.server_timing()
+        response.profile = profile
+
+        line = {'method': request.method, 'path': request.path, 'status': response.status_code}
+        line.update(profile.as_dict())
+        if profile.budget is not None and profile.queries > profile.budget:
+            message = f'{profile.view} ran {profile.queries} queries, budget {profile.budget}'
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(json.dumps(line))
+        else:
+            logger.info(json.dumps(line))
+        return response
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from accounts.models import ArtisanProfile
+from .models import Review
+
+
+def _score(rating_sum, rating_count):
+    """Bayesian average as a SQL expression over the given sum and count expressions"""
+    prior_weight = settings.RATING_PRIOR_WEIGHT
+    prior_total = settings.RATING_PRIOR_MEAN * prior_weight
+    return (Value(prior_total) + Cast(rating_sum, FloatField())) / (Value(float(prior_weight)) + rating_count)
+
+
+def apply_rating_change(artisan_id, sum_delta, count_delta):
+    """
+    Shift an artisan's running aggregates in a single UPDATE.
+    Every right-hand side reads the pre-update row, so concurrent reviews never lose a write.
+    """
+    if not sum_delta and not count_delta:
+        return
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('rating_count') + count_delta
+    ArtisanProfile.objects.filter(pk=artisan_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_score=Case(
+            When(rating_count=-count_delta, then=Value(0.0)),
+            default=_score(new_sum, new_count),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def review_saved(review, created):
+    artisan_id, rating = review._current_rating()
+    if created:
+        apply_rating_change(artisan_id, rating, 1)
+        return
+
+    old_artisan_id, old_rating = getattr(review, '_loaded_rating', (None, None))
+    if old_artisan_id is None:
+        # saved from an instance that was never loaded, only the rebuild can reconcile it
+        return
+    if old_artisan_id != artisan_id:
+        apply_rating_change(old_artisan_id, -old_rating, -1)
+        apply_rating_change(artisan_id, rating, 1)
+    elif old_rating != rating:
+        apply_rating_change(artisan_id, rating - old_rating, 0)
+
+
+def review_deleted(review):
+    artisan_id, rating = getattr(review, '_loaded_rating', None) or review._current_rating()
+    apply_rating_change(artisan_id, -rating, -1)
+
+
+def rebuild_ratings(artisans=None):
+    """Recompute the aggregates from the reviews in two set-based UPDATEs"""
+    if artisans is None:
+        artisans = ArtisanProfile.objects.all()
+    reviews = Review.objects.filter(artisan=OuterRef('pk')).values('artisan')
+    artisans.update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        rating_count=Coalesce(Subquery(reviews.annotate(count=Count('*')).values('count')), 0),
+    )
+    return artisans.update(rating_score=Case(
+        When(rating_count=0, then=Value(0.0)),
+        default=_score(F('rating_sum'), F('rating_count')),
+        output_field=FloatField(),
+    ))
+
+
+def rebuild_ratings_batch(artisans, after_id=None, batch_size=None):
+    """
+    Rebuild the next batch of artisans in id order after after_id. Returns the rows updated and
+    the batch's last id, None once there are none left. Id ranges keep each UPDATE, and the row
+    locks it holds, short.
+    """
+    ids = artisans.order_by('id').values_list('id', flat=True)
+    if after_id is not None:
+        ids = ids.filter(id__gt=after_id)
+    ids = list(ids[:batch_size or settings.RATING_REBUILD_BATCH_SIZE])
+    if not ids:
+        return 0, None
+    return rebuild_ratings(artisans.filter(id__gte=ids[0], id__lte=ids[-1])), ids[-1]
@@ -0,0 +1,31 @@
+import functools
+import redis
+from django.conf import settings
+from django_redis import get_redis_connection
+
+
+def get_redis():
+    """
+    Raw redis client behind the default cache, for lists, scripts and streams the cache API
+    does not cover. Returns None when the cache is not django-redis (CACHE_URL=locmemcache://)
+    so callers can fall back to a local implementation.
+    """
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+@functools.cache
+def _client(url):
+    return redis.Redis.from_url(url)
+
+
+def get_queue_redis():
+    """
+    Client for QUEUE_REDIS_URL, the noeviction redis holding work that must not be lost
+    (queued mail, buffered interactions). The default cache evicts under memory pressure.
+    Returns None when it is not configured.
+    """
+    url = settings.QUEUE_REDIS_URL
+    return _client(url) if url else None
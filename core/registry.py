@@ -0,0 +1,71 @@
+import threading
+import time
+from django.apps import apps
+from django.conf import settings
+from .cache import get_taxonomy_version
+
+
+class NameRegistry:
+    """
+    Per-process name -> id map for a small lookup table (services, categories, ...).
+    Entries are reloaded after TAXONOMY_REGISTRY_TTL seconds only if the shared
+    taxonomy version moved, and dropped immediately by the model signals in this process.
+    """
+
+    def __init__(self, model_label, field='name'):
+        self.model_label = model_label
+        self.field = field
+        self._ids = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        model = apps.get_model(self.model_label)
+        ids = {}
+        # keep the lowest id when a name is duplicated, matching what get() would have picked
+        for pk, name in model.objects.order_by('-pk').values_list('pk', self.field):
+            ids[name] = pk
+        return ids
+
+    def _get_ids(self):
+        now = time.monotonic()
+        # one read of the attribute, invalidate() may reset it to None in between
+        ids = self._ids
+        if ids is not None and now - self._checked_at < settings.TAXONOMY_REGISTRY_TTL:
+            return ids
+
+        with self._lock:
+            if self._ids is None or now - self._checked_at >= settings.TAXONOMY_REGISTRY_TTL:
+                version = get_taxonomy_version()
+                if self._ids is None or version != self._version:
+                    self._ids = self._load()
+                    self._version = version
+                self._checked_at = now
+            return self._ids
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+
+    def __contains__(self, name):
+        return name in self._get_ids()
+
+    def get(self, name, default=None):
+        return self._get_ids().get(name, default)
+
+    def resolve(self, names):
+        """Map names to ids, returning (ids, missing_names)"""
+        ids = self._get_ids()
+        found, missing = [], []
+        for name in names:
+            if name in ids:
+                found.append(ids[name])
+            else:
+                missing.append(name)
+        return found, missing
+
+
+categories = NameRegistry('core.Category')
+services = NameRegistry('core.Service')
+availability_options = NameRegistry('accounts.AvailabilityOption')
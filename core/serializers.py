@@ -1,5 +1,56 @@
+from django.conf import settings
+from PIL import Image
 from rest_framework import serializers
-from .models import Category, Service
+from .models import Category, Service, Post
+from .interactions import EVENT_TYPES
+from .images import variant_urls
+from .uploads import UPLOAD_KINDS
+
+
+class ImageVariantsField(serializers.Field):
+    """Read-only variants of an image field, null until the pipeline has processed it"""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        return variant_urls(image.storage, getattr(instance, f'{self.image_field}_variants'))
+
+
+class HeaderOnlyImageField(serializers.FileField):
+    """
+    ImageField that only parses the image header, Pillow reads the format and size
+    without decoding pixels. The full decode happens in the variants task, off the web worker.
+    """
+    formats = ('JPEG', 'PNG', 'WEBP')
+    default_error_messages = {
+        'invalid_image': 'Upload a valid JPEG, PNG or WebP image.',
+        'too_many_pixels': 'Image dimensions are too large.',
+    }
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            with Image.open(file) as image:
+                image_format, (width, height) = image.format, image.size
+        except Image.DecompressionBombError:
+            # Pillow's own limit, raised from the header of the most extreme sizes
+            self.fail('too_many_pixels')
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+
+        if image_format not in self.formats:
+            self.fail('invalid_image')
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels')
+        file.content_type = Image.MIME[image_format]
+        return file
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,4 +64,39 @@ class ServiceSerializer(serializers.ModelSerializer):
         fields = ["name", "category"]
 
 
+class PostSerializer(serializers.ModelSerializer):
+    category = serializers.StringRelatedField()
+    # callers prefetch tags, see core.feed.get_client_feed
+    tags = serializers.SlugRelatedField(slug_field='name', many=True, read_only=True)
+    image_variants = ImageVariantsField('image')
+
+    class Meta:
+        model = Post
+        fields = ["id", "artisan", "image", "image_variants", "job_title", "description", "category", "tags", "price", "created_at"]
+
+
+class InteractionEventSerializer(serializers.Serializer):
+    # post ids are checked when the buffer is flushed, not per event
+    post = serializers.IntegerField(min_value=1)
+    type = serializers.ChoiceField(choices=EVENT_TYPES)
+
+
+class InteractionBatchSerializer(serializers.Serializer):
+    events = InteractionEventSerializer(many=True, allow_empty=False, max_length=settings.INTERACTION_MAX_EVENTS)
+
+
+class UploadTicketSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=list(UPLOAD_KINDS))
+    content_type = serializers.CharField()
+    # the post a post_image upload replaces the image of
+    post = serializers.IntegerField(required=False, min_value=1)
 
+    def validate(self, data):
+        allowed = UPLOAD_KINDS[data['kind']]['types']
+        if data['content_type'] not in allowed:
+            raise serializers.ValidationError({
+                "content_type": f"Allowed types for {data['kind']}: {', '.join(allowed)}"
+            })
+        if data['kind'] == 'post_image' and 'post' not in data:
+            raise serializers.ValidationError({"post": "This field is required for post_image uploads."})
+        return data
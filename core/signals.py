@@ -1,12 +1,25 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from accounts.models import ClientProfile, ArtisanProfile
+from accounts.models import ClientProfile, ArtisanProfile, AvailabilityOption
+from accounts.authentication import mark_user_changed
+from accounts.search import sync_search_index, remove_from_search_index
 from django.contrib.auth import get_user_model
+from .models import Post, Category, Service, Review
+from .tasks import fanout_post_to_feeds, process_image_variants
+from .cache import bump_taxonomy_version
+from . import registry
+from .ratings import review_saved, review_deleted
+from .images import needs_processing
 
 User = get_user_model()
 
 @receiver(post_save, sender=User)
-def create_or_update_profile(sender, instance, created, **kwargs):
+def create_or_update_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Logins, OTP activation and password changes leave the roles alone, skip them without a query
+    if not created and not instance.changed_claims(update_fields) & set(User.ROLE_FIELDS):
+        return
+
     # Handle creation
     if created:
         if instance.is_client:
@@ -31,4 +44,76 @@ def create_or_update_profile(sender, instance, created, **kwargs):
         else:
             # If neither client nor artisan, delete both profiles
             ClientProfile.objects.filter(user=instance).delete()
-            ArtisanProfile.objects.filter(user=instance).delete()
\ No newline at end of file
+            ArtisanProfile.objects.filter(user=instance).delete()
+
+
+@receiver(post_save, sender=User)
+def mark_token_claims_stale(sender, instance, created, update_fields=None, **kwargs):
+    # access tokens embed these flags, make existing ones fall back to a User lookup
+    if not created and instance.changed_claims(update_fields):
+        transaction.on_commit(lambda: mark_user_changed(instance.pk))
+
+
+@receiver(post_save, sender=Post)
+def fanout_post_on_save(sender, instance, created, update_fields=None, **kwargs):
+    # only the category decides the fan-out here, image and description saves skip it without a
+    # query; tag changes fan out from m2m_changed and deletes cascade to the FeedEntry rows
+    if not created and not instance.category_changed(update_fields):
+        return
+    transaction.on_commit(lambda: fanout_post_to_feeds.delay(instance.id))
+
+
+@receiver(post_save, sender=ArtisanProfile)
+def index_artisan_on_save(sender, instance, **kwargs):
+    # same transaction as the save, a rollback leaves the index untouched
+    sync_search_index(instance)
+
+
+@receiver(post_delete, sender=ArtisanProfile)
+def unindex_artisan_on_delete(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def fanout_post_on_tags_change(sender, instance, action, reverse, **kwargs):
+    # tags are set after the post row is saved, refresh the fan-out once they land
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        transaction.on_commit(lambda: fanout_post_to_feeds.delay(instance.id))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=ClientProfile)
+@receiver(post_save, sender=ArtisanProfile)
+def process_uploaded_image(sender, instance, **kwargs):
+    # compares the stored name with the one the variants were built from, no query
+    if needs_processing(instance):
+        label, pk = sender._meta.label, instance.pk
+        transaction.on_commit(lambda: process_image_variants.delay(label, pk))
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    review_deleted(instance)
+
+
+TAXONOMY_REGISTRIES = {
+    Category: registry.categories,
+    Service: registry.services,
+    AvailabilityOption: registry.availability_options,
+}
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=AvailabilityOption)
+def invalidate_taxonomy_cache(sender, **kwargs):
+    def invalidate():
+        TAXONOMY_REGISTRIES[sender].invalidate()
+        bump_taxonomy_version()
+
+    transaction.on_commit(invalidate)
@@ -0,0 +1,105 @@
+from celery import shared_task
+from django.conf import settings
+from django.apps import apps
+from django.core.cache import cache
+from PIL import UnidentifiedImageError
+from accounts.models import ClientProfile
+from .feed import fanout_post, rebuild_client_feed
+from .interactions import flush_buffer
+from .maintenance import run_job
+from .images import process_instance_image
+from .uploads import is_valid_upload, reject_upload
+from .models import Post
+
+FLUSH_SCHEDULED_KEY = 'interactions:flush-scheduled'
+FLUSH_LOCK_KEY = 'interactions:flush-lock'
+
+
+@shared_task(bind=True, max_retries=3)
+def fanout_post_to_feeds(self, post_id):
+    try:
+        post = Post.objects.get(id=post_id)
+    except Post.DoesNotExist:
+        # deleted before the task ran, its feed entries went with it
+        return
+
+    try:
+        fanout_post(post)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def rebuild_feed(self, client_id):
+    profile = ClientProfile.objects.filter(id=client_id).first()
+    if profile is None:
+        return
+
+    try:
+        rebuild_client_feed(profile)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def process_image_variants(self, model_label, pk):
+    try:
+        process_instance_image(model_label, pk)
+    except (FileNotFoundError, UnidentifiedImageError):
+        # the upload was replaced, removed or rejected before the task ran
+        return
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def validate_upload(self, model_label, pk, key, kind):
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    try:
+        if not is_valid_upload(key, kind):
+            reject_upload(instance, key, kind)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+
+def schedule_interaction_flush():
+    # one flush per interval, events arriving meanwhile are coalesced into it
+    countdown = settings.INTERACTION_FLUSH_INTERVAL
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, timeout=countdown + settings.INTERACTION_FLUSH_SCHEDULE_TIMEOUT):
+        flush_interactions.apply_async(countdown=countdown)
+
+
+@shared_task(bind=True, max_retries=3)
+def flush_interactions(self):
+    cache.delete(FLUSH_SCHEDULED_KEY)
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=settings.INTERACTION_FLUSH_LOCK_TIMEOUT):
+        # the running flush may already be past the events that scheduled this one
+        schedule_interaction_flush()
+        return 0
+    try:
+        return flush_buffer()
+    except Exception as e:
+        # unwritten events stay in the stream for the retry
+        raise self.retry(exc=e, countdown=settings.INTERACTION_FLUSH_INTERVAL)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+@shared_task
+def ensure_interaction_flush():
+    # periodic safety net in case a scheduled flush was lost, a pending one is left alone
+    schedule_interaction_flush()
+
+
+@shared_task
+def run_maintenance(name):
+    """Entry point of every maintenance job in CELERY_BEAT_SCHEDULE, see core/maintenance.py"""
+    result = run_job(name)
+    if result['status'] == 'partial':
+        # out of time budget, continue from the saved cursor after a breather
+        run_maintenance.apply_async((name,), countdown=settings.MAINTENANCE_CONTINUE_DELAY)
+    return result
@@ -0,0 +1,64 @@
+from unittest import skipUnless
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from accounts.authentication import mark_user_changed
+from accounts.tokens import RoleRefreshToken
+from . import registry
+from .profiling import install_query_recorder
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+# redis lists, streams and Lua scripts run in memory, see requirements-dev.txt
+requires_fakeredis = skipUnless(fakeredis, 'fakeredis[lua] is not installed')
+
+
+def fake_redis():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+@override_settings(PROFILING_ENABLED=True, QUERY_BUDGET_STRICT=True, THROTTLE_ENABLED=False)
+class ProfiledAPITestCase(APITestCase):
+    """
+    APITestCase with ProfilingMiddleware on and query budgets enforced: a request to a view
+    declared with @query_budget(n) that runs more than n queries raises QueryBudgetExceeded.
+
+    Each test starts cold, with an empty cache and unloaded registries, so a budget holds
+    for the first request a worker serves and not only for warm ones.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for names in (registry.categories, registry.services, registry.availability_options):
+            names.invalidate()
+        # the async client builds its middleware on the event loop thread, which never sees the
+        # test thread's already open connection the queries run on
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def authenticate(self, user, stale=False):
+        """
+        Send a real access token for user, and return it. stale flags the user as changed
+        after it was issued, so authentication loads the User row instead of trusting the claims.
+        """
+        token = RoleRefreshToken.for_user(user).access_token
+        if stale:
+            mark_user_changed(user.pk)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return token
+
+    def assertMaxQueries(self, response, limit):
+        """Tighter per-test bound, for endpoints whose cost depends on the fixture"""
+        profile = response.profile
+        self.assertLessEqual(
+            profile.queries, limit,
+            f'{profile.view} ran {profile.queries} queries, expected at most {limit}'
+        )
+
+    def assertServerTiming(self, response):
+        self.assertIn('db;dur=', response['Server-Timing'])
@@ -1,3 +1,617 @@
-from django.test import TestCase
+import shutil
+import struct
+import tempfile
+import zlib
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.http import QueryDict
+from django.urls import path
+from django.utils import timezone
+from PIL import Image
+from redis.exceptions import RedisError
+from accounts.models import ArtisanProfile
+from . import async_views
+from .feed import fanout_post, get_client_feed
+from .images import build_variants, process_instance_image
+from .interactions import RedisInteractionBuffer
+from .maintenance import MaintenanceJob, get_status, run_job
+from .models import Category, Post, Review, Service, Tag, UserInteraction
+from .ratings import rebuild_ratings
+from .tasks import FLUSH_LOCK_KEY, flush_interactions, run_maintenance
+from .testing import ProfiledAPITestCase, fake_redis, requires_fakeredis
+from .upload_handlers import FileSizeLimitUploadHandler
+from .uploads import create_upload_ticket
 
-# Create your tests here.
+User = get_user_model()
+
+
+def image_file(name='photo.jpg', size=(64, 48)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        artisan = User.objects.create_user(email='artisan@example.com', password='pass', is_artisan=True)
+        self.post = Post.objects.create(
+            artisan=artisan.artisanprofile, image=image_file(), job_title='Tiling', description='', price=10,
+        )
+
+    def test_field_points_at_the_reencoded_copy(self):
+        original = self.post.image.name
+        data = process_instance_image('core.Post', self.post.pk)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image.name, data['source'])
+        self.assertTrue(default_storage.exists(data['source']))
+        self.assertFalse(default_storage.exists(original))
+        for variant in data['variants']:
+            self.assertTrue(default_storage.exists(variant['webp']))
+
+    def test_copy_discarded_when_image_replaced_meanwhile(self):
+        original = self.post.image.name
+
+        def build_then_replace(field_file, widths):
+            # another save swaps the image between the task's read and its update
+            data = build_variants(field_file, widths)
+            Post.objects.filter(pk=self.post.pk).update(image='services/other.jpg')
+            return data
+
+        with mock.patch('core.images.build_variants', side_effect=build_then_replace):
+            self.assertIsNone(process_instance_image('core.Post', self.post.pk))
+
+        _, files = default_storage.listdir('services')
+        self.assertEqual(files, [original.rsplit('/', 1)[-1]])
+
+
+def png_header(width, height):
+    """A PNG declaring width x height whose image data chunk is empty"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', b'')
+
+
+class MultipartUploadTests(ProfiledAPITestCase):
+    """Profile pictures sent through the API, rejected from the headers or the first chunks past the cap"""
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate(User.objects.create_user(email='client@example.com', password='pass', is_client=True))
+
+    def upload(self, content, name='photo.png'):
+        return self.client.put('/api/client/onboarding/', {
+            'profile_picture': SimpleUploadedFile(name, content, content_type='image/png'),
+        }, format='multipart')
+
+    @override_settings(UPLOAD_MAX_IMAGE_SIZE=100 * 1024)
+    def test_oversized_file_stops_at_the_chunk_past_the_cap(self):
+        receive = FileSizeLimitUploadHandler.receive_data_chunk
+        with mock.patch.object(
+            FileSizeLimitUploadHandler, 'receive_data_chunk', autospec=True, side_effect=receive,
+        ) as received:
+            response = self.upload(b'\0' * 1024 * 1024)
+        self.assertEqual(response.status_code, 400)
+        # 64 KiB chunks, the second one crosses 100 KiB and the other 14 are never read
+        self.assertEqual(received.call_count, 2)
+
+    @override_settings(UPLOAD_MAX_REQUEST_SIZE=1024)
+    def test_oversized_request_rejected_from_content_length(self):
+        with mock.patch.object(FileSizeLimitUploadHandler, 'receive_data_chunk') as received:
+            response = self.upload(b'\0' * 4096)
+        self.assertEqual(response.status_code, 400)
+        received.assert_not_called()
+
+    def test_non_image_rejected(self):
+        response = self.upload(b'%PDF-1.4 not an image', name='photo.pdf')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['profile_picture'], ['Upload a valid JPEG, PNG or WebP image.'])
+
+    def test_pixel_bomb_rejected_from_its_header(self):
+        # there are no pixels to decode, only the header can have been read
+        for width, height in ((8000, 6000), (20000, 20000)):
+            response = self.upload(png_header(width, height))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['profile_picture'], ['Image dimensions are too large.'])
+
+
+class BudgetFixture(ProfiledAPITestCase):
+    """Posts, feed entries and services for the query budget tests"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.category = Category.objects.create(name='Home Services')
+        tag = Tag.objects.create(name='tiling')
+        self.artisan = User.objects.create_user(email='artisan@example.com', password='pass', is_artisan=True)
+        self.client_user = User.objects.create_user(email='client@example.com', password='pass', is_client=True)
+        self.client_user.clientprofile.preferred_categories.add(self.category)
+        for n in range(3):
+            post = Post.objects.create(
+                artisan=self.artisan.artisanprofile, image=image_file(), job_title=f'Job {n}',
+                description='', price=10, category=self.category,
+            )
+            post.tags.add(tag)
+            fanout_post(post)
+        for n in range(3):
+            Service.objects.create(name=f'Service {n}', category=self.category)
+
+
+class CoreQueryBudgetTests(BudgetFixture):
+    """Every budgeted core endpoint on cold caches with a stale token, its worst first request"""
+
+    def test_feed(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.client.get('/api/feed/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 3)
+        self.assertServerTiming(response)
+
+    def test_artisan_posts(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.client.get(f'/api/artisans/{self.artisan.artisanprofile.id}/posts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 3)
+
+    def test_upload_ticket(self):
+        self.authenticate(self.artisan, stale=True)
+        response = self.client.post(
+            '/api/uploads/tickets/', {'kind': 'profile_picture', 'content_type': 'image/jpeg'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_upload_confirm(self):
+        post = Post.objects.filter(artisan__user=self.artisan).first()
+        ticket = create_upload_ticket(self.artisan, 'post_image', 'image/jpeg', local_url='', object_id=post.id)
+        default_storage.save(ticket['key'], image_file())
+
+        self.authenticate(self.artisan, stale=True)
+        response = self.client.post('/api/uploads/confirm/', {'ticket': ticket['ticket']}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_categories(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['name'] for c in response.data['data']], ['Home Services'])
+
+    def test_services(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.client.get('/api/services/', {'category': 'Home Services'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 3)
+
+
+class ServiceCacheTests(BudgetFixture):
+    def test_next_link_is_relative_and_normalized(self):
+        self.authenticate(self.client_user)
+        response = self.client.get('/api/services/', {'category': 'Home Services', 'page_size': 2, 'utm': 'x'})
+        self.assertEqual(len(response.data['data']), 2)
+        path, query = response.data['next'].split('?')
+        self.assertEqual(path, '/api/services/')
+        self.assertEqual(sorted(QueryDict(query)), ['category', 'cursor', 'page_size'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['data']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_pages_are_not_cached(self):
+        self.authenticate(self.client_user)
+        next_link = self.client.get('/api/services/', {'page_size': 2}).data['next']
+        with mock.patch('core.views.get_or_set_taxonomy') as get_or_set:
+            for _ in range(2):
+                response = self.client.get(next_link)
+                self.assertEqual(len(response.data['data']), 1)
+        get_or_set.assert_not_called()
+
+    def test_unknown_params_share_the_cached_page(self):
+        self.authenticate(self.client_user)
+        self.client.get('/api/services/', {'category': 'Home Services'})
+        for n in range(3):
+            response = self.client.get('/api/services/', {'category': 'Home Services', 'n': n})
+            self.assertEqual(response.profile.queries, 0)
+            self.assertEqual(len(response.data['data']), 3)
+
+
+class LocalUploadTests(BudgetFixture):
+    def test_ticket_uploads_once(self):
+        ticket = create_upload_ticket(self.artisan, 'profile_picture', 'image/jpeg', local_url='/api/uploads/local/')
+
+        def upload():
+            file = SimpleUploadedFile('photo.jpg', image_file().read(), content_type='image/jpeg')
+            return self.client.post('/api/uploads/local/', {'ticket': ticket['ticket'], 'file': file})
+
+        self.assertEqual(upload().status_code, 204)
+        self.assertEqual(upload().status_code, 400)
+        _, files = default_storage.listdir('profile_pictures')
+        self.assertEqual(files, [ticket['key'].rsplit('/', 1)[-1]])
+
+
+class InteractionTests(BudgetFixture):
+    def send(self, *events):
+        post = Post.objects.first()
+        self.authenticate(self.client_user)
+        response = self.client.post('/api/interactions/', {'events': [
+            {'post': post.id, 'type': event} for event in events
+        ]}, format='json')
+        self.assertEqual(response.status_code, 202)
+        return post
+
+    def interaction(self, post):
+        return UserInteraction.objects.get(user=self.client_user, post=post)
+
+    def test_written_inline_without_redis(self):
+        interaction = self.interaction(self.send('view', 'like'))
+        self.assertTrue(interaction.viewed)
+        self.assertTrue(interaction.liked)
+
+    @requires_fakeredis
+    def test_buffered_until_flushed(self):
+        redis = fake_redis()
+        with mock.patch('core.interactions.get_queue_redis', return_value=redis), \
+                mock.patch('core.tasks.flush_interactions.apply_async') as scheduled:
+            post = self.send('like', 'unlike')
+            self.assertFalse(UserInteraction.objects.exists())
+            scheduled.assert_called_once()
+
+            self.assertEqual(flush_interactions.apply().result, 1)
+        self.assertEqual(redis.xlen(RedisInteractionBuffer.key), 0)
+        self.assertFalse(self.interaction(post).liked)
+
+    @requires_fakeredis
+    def test_flush_waits_for_the_running_one(self):
+        redis = fake_redis()
+        with mock.patch('core.interactions.get_queue_redis', return_value=redis), \
+                mock.patch('core.tasks.flush_interactions.apply_async'):
+            self.send('view')
+            cache.add(FLUSH_LOCK_KEY, 1)
+            with mock.patch('core.tasks.schedule_interaction_flush') as schedule:
+                self.assertEqual(flush_interactions.apply().result, 0)
+        schedule.assert_called_once()
+        self.assertEqual(redis.xlen(RedisInteractionBuffer.key), 1)
+
+    def test_written_inline_when_the_buffer_fails(self):
+        redis = mock.Mock()
+        redis.pipeline.return_value.execute.side_effect = RedisError('OOM command not allowed')
+        with mock.patch('core.interactions.get_queue_redis', return_value=redis):
+            interaction = self.interaction(self.send('view'))
+        self.assertTrue(interaction.viewed)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Home Services')
+        self.artisan = User.objects.create_user(email='artisan@example.com', password='pass', is_artisan=True)
+        self.profile = User.objects.create_user(email='client@example.com', password='pass', is_client=True).clientprofile
+        self.profile.preferred_categories.add(self.category)
+
+    def create_post(self, created_at):
+        post = Post.objects.create(
+            artisan=self.artisan.artisanprofile, image='services/x.jpg', job_title='Job',
+            description='', price=10, category=self.category,
+        )
+        Post.objects.filter(pk=post.pk).update(created_at=created_at)
+        post.refresh_from_db()
+        return post
+
+    @override_settings(FEED_MAX_ENTRIES=2)
+    def test_fanout_trims_to_max_entries(self):
+        now = timezone.now()
+        posts = [self.create_post(now - timedelta(hours=hours)) for hours in (2, 0, 3, 1)]
+        for post in posts:
+            fanout_post(post)
+
+        feed = list(get_client_feed(self.profile).values_list('post_id', flat=True))
+        self.assertEqual(feed, [posts[1].id, posts[3].id])
+
+
+class RatingTests(TestCase):
+    def setUp(self):
+        self.first = User.objects.create_user(email='one@example.com', password='pass', is_artisan=True).artisanprofile
+        self.second = User.objects.create_user(email='two@example.com', password='pass', is_artisan=True).artisanprofile
+        self.client_profile = User.objects.create_user(
+            email='client@example.com', password='pass', is_client=True,
+        ).clientprofile
+
+    def review(self, artisan, rating):
+        return Review.objects.create(client=self.client_profile, artisan=artisan, rating=rating, comment='')
+
+    def assertRating(self, artisan, rating_sum, rating_count):
+        artisan.refresh_from_db()
+        self.assertEqual((artisan.rating_sum, artisan.rating_count), (rating_sum, rating_count))
+        if rating_count:
+            prior = settings.RATING_PRIOR_MEAN * settings.RATING_PRIOR_WEIGHT
+            score = (prior + rating_sum) / (settings.RATING_PRIOR_WEIGHT + rating_count)
+            self.assertAlmostEqual(artisan.rating_score, score)
+        else:
+            self.assertEqual(artisan.rating_score, 0)
+
+    def test_new_reviews(self):
+        self.review(self.first, 5)
+        self.review(self.first, 2)
+        self.assertRating(self.first, 7, 2)
+
+    def test_edited_rating(self):
+        self.review(self.first, 5)
+        review = Review.objects.get()
+        review.rating = 1
+        review.save()
+        self.assertRating(self.first, 1, 1)
+
+    def test_review_moved_to_another_artisan(self):
+        self.review(self.first, 4)
+        review = self.review(self.first, 2)
+        review.artisan = self.second
+        review.rating = 3
+        review.save()
+        self.assertRating(self.first, 4, 1)
+        self.assertRating(self.second, 3, 1)
+
+    def test_deleting_the_last_review(self):
+        review = self.review(self.first, 4)
+        self.assertRating(self.first, 4, 1)
+        Review.objects.get(pk=review.pk).delete()
+        self.assertRating(self.first, 0, 0)
+
+    def test_rebuild_matches_the_incremental_aggregates(self):
+        for rating in (5, 3, 1):
+            self.review(self.first, rating)
+        moved = self.review(self.second, 2)
+        moved.artisan = self.first
+        moved.save()
+        Review.objects.filter(rating=3).get().delete()
+        incremental = [
+            (a.rating_sum, a.rating_count, a.rating_score) for a in ArtisanProfile.objects.order_by('id')
+        ]
+
+        ArtisanProfile.objects.update(rating_sum=0, rating_count=0, rating_score=0)
+        self.assertEqual(rebuild_ratings(), 2)
+        rebuilt = [(a.rating_sum, a.rating_count, a.rating_score) for a in ArtisanProfile.objects.order_by('id')]
+        self.assertEqual(rebuilt, incremental)
+        self.assertRating(self.first, 8, 3)
+        self.assertRating(self.second, 0, 0)
+
+
+class CountingJob(MaintenanceJob):
+    """Three batches, cursors 1, 2 and 3, recording the cursor each batch started from"""
+    name = 'counting'
+
+    def __init__(self):
+        self.started_from = []
+
+    def run_batch(self, cursor):
+        self.started_from.append(cursor)
+        cursor = (cursor or 0) + 1
+        return 10, cursor if cursor < 3 else None
+
+
+@override_settings(MAINTENANCE_BATCH_PAUSE=0)
+class MaintenanceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.job = CountingJob()
+        patcher = mock.patch('core.maintenance.get_job', return_value=self.job)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_runs_until_done(self):
+        result = run_job('counting')
+        self.assertEqual((result['status'], result['processed'], result['batches']), ('done', 30, 3))
+        self.assertEqual(self.job.started_from, [None, 1, 2])
+        self.assertEqual(get_status('counting')['last_run']['processed'], 30)
+        self.assertIsNone(get_status('counting')['progress'])
+        self.assertFalse(get_status('counting')['running'])
+
+    @override_settings(MAINTENANCE_TIME_BUDGET=0)
+    def test_partial_runs_resume_from_the_cursor(self):
+        self.assertEqual(run_job('counting')['status'], 'partial')
+        self.assertEqual(get_status('counting')['progress']['cursor'], 1)
+        self.assertEqual(run_job('counting')['status'], 'partial')
+
+        result = run_job('counting')
+        self.assertEqual((result['status'], result['processed'], result['batches']), ('done', 30, 3))
+        self.assertEqual(self.job.started_from, [None, 1, 2])
+
+    def test_locked_while_another_run_holds_the_job(self):
+        cache.add('maintenance:counting:lock', 'other-run')
+        self.assertEqual(run_job('counting')['status'], 'locked')
+        self.assertEqual(self.job.started_from, [])
+        self.assertEqual(cache.get('maintenance:counting:lock'), 'other-run')
+
+    def test_partial_run_continues_itself(self):
+        with mock.patch('core.tasks.run_maintenance.apply_async') as continue_later, \
+                override_settings(MAINTENANCE_TIME_BUDGET=0):
+            run_maintenance.apply(('counting',))
+        continue_later.assert_called_once_with(('counting',), countdown=settings.MAINTENANCE_CONTINUE_DELAY)
+
+        with mock.patch('core.tasks.run_maintenance.apply_async') as continue_later:
+            self.assertEqual(run_maintenance.apply(('counting',)).result['status'], 'done')
+        continue_later.assert_not_called()
+
+
+class RecomputeRatingsTests(TestCase):
+    def setUp(self):
+        client = User.objects.create_user(email='client@example.com', password='pass', is_client=True)
+        self.artisans = []
+        for n in range(3):
+            artisan = User.objects.create_user(email=f'{n}@example.com', password='pass', is_artisan=True)
+            Review.objects.create(client=client.clientprofile, artisan=artisan.artisanprofile, rating=n + 2, comment='')
+            self.artisans.append(artisan.artisanprofile)
+        self.expected = list(ArtisanProfile.objects.order_by('id').values_list('rating_sum', 'rating_score'))
+        # drift the incremental aggregates
+        ArtisanProfile.objects.update(rating_sum=0, rating_count=0, rating_score=0)
+
+    def aggregates(self):
+        return list(ArtisanProfile.objects.order_by('id').values_list('rating_sum', 'rating_score'))
+
+    @override_settings(MAINTENANCE_BATCH_SIZE=2, MAINTENANCE_BATCH_PAUSE=0)
+    def test_job(self):
+        cache.clear()
+        result = run_job('recompute_ratings')
+        self.assertEqual((result['status'], result['processed'], result['batches']), ('done', 3, 3))
+        self.assertEqual(self.aggregates(), self.expected)
+
+    @override_settings(RATING_REBUILD_BATCH_SIZE=2)
+    def test_command(self):
+        out = StringIO()
+        call_command('rebuild_ratings', stdout=out)
+        self.assertIn('Rebuilt ratings of 3 artisans', out.getvalue())
+        self.assertEqual(self.aggregates(), self.expected)
+
+
+class PostTagsMigrationTests(TransactionTestCase):
+    """The backfill of 0004_post_tags_m2m from the old free-text tags column"""
+    accounts_state = ('accounts', '0006_remove_artisanprofile_about_and_more')
+    migrate_from = [('core', '0003_post_keyset_indexes'), accounts_state]
+    migrate_to = [('core', '0004_post_tags_m2m'), accounts_state]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.addCleanup(self.migrate_to_latest)
+        apps = executor.loader.project_state(self.migrate_from).apps
+
+        user = apps.get_model('core', 'User').objects.create(email='artisan@example.com', is_artisan=True)
+        artisan = apps.get_model('accounts', 'ArtisanProfile').objects.create(user=user)
+        apps.get_model('core', 'Tag').objects.create(name='Plumbing')
+        Post = apps.get_model('core', 'Post')
+        self.tagged = Post.objects.create(
+            artisan=artisan, image='services/x.jpg', job_title='Job', description='', price=10,
+            tags='plumbing, #Repairs,  , tiling#repairs',
+        ).pk
+        self.untagged = Post.objects.create(
+            artisan=artisan, image='services/y.jpg', job_title='Job', description='', price=10, tags='',
+        ).pk
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        self.apps = executor.loader.project_state(self.migrate_to).apps
+
+    def migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill_splits_and_matches_tags(self):
+        Post = self.apps.get_model('core', 'Post')
+        names = {name.lower() for name in Post.objects.get(pk=self.tagged).tags.values_list('name', flat=True)}
+        self.assertEqual(names, {'plumbing', 'repairs', 'tiling'})
+        # the existing tag is reused, "Repairs" and "repairs" share one
+        self.assertEqual(self.apps.get_model('core', 'Tag').objects.count(), 3)
+        self.assertFalse(Post.objects.get(pk=self.untagged).tags.exists())
+
+
+class TagFanoutTests(TestCase):
+    def setUp(self):
+        self.tag = Tag.objects.create(name='tiling')
+        self.artisan = User.objects.create_user(email='artisan@example.com', password='pass', is_artisan=True)
+        self.profile = User.objects.create_user(email='client@example.com', password='pass', is_client=True).clientprofile
+        self.profile.followed_tags.add(self.tag)
+        self.post = Post.objects.create(
+            artisan=self.artisan.artisanprofile, image='services/x.jpg', job_title='Job', description='', price=10,
+        )
+
+    def saved_fanouts(self, post, **save_kwargs):
+        with mock.patch('core.signals.fanout_post_to_feeds.delay') as fanout, \
+                mock.patch('core.signals.process_image_variants.delay'):
+            with self.captureOnCommitCallbacks(execute=True):
+                post.save(**save_kwargs)
+        return fanout.call_count
+
+    def test_save_fans_out_on_create_and_category_change_only(self):
+        post = Post(
+            artisan=self.artisan.artisanprofile, image='services/y.jpg', job_title='Job', description='', price=10,
+        )
+        self.assertEqual(self.saved_fanouts(post), 1)
+
+        post = Post.objects.get(pk=post.pk)
+        post.description = 'Edited'
+        self.assertEqual(self.saved_fanouts(post), 0)
+        post.image_variants = {'source': 'services/y.jpg'}
+        self.assertEqual(self.saved_fanouts(post, update_fields=['image_variants']), 0)
+
+        post.category = Category.objects.create(name='Home Services')
+        self.assertEqual(self.saved_fanouts(post), 1)
+        # the new category is now the loaded one
+        self.assertEqual(self.saved_fanouts(post), 0)
+
+    def test_adding_a_followed_tag_fans_the_post_out(self):
+        def fanout_now(post_id):
+            fanout_post(Post.objects.get(id=post_id))
+
+        with mock.patch('core.signals.fanout_post_to_feeds.delay', side_effect=fanout_now) as fanout:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.tags.add(self.tag)
+        fanout.assert_called_once_with(self.post.id)
+        self.assertEqual(list(get_client_feed(self.profile).values_list('post_id', flat=True)), [self.post.id])
+
+
+# the async views are only routed under ASGI, AsyncQueryBudgetTests mounts them here
+urlpatterns = [
+    path('api/feed/', async_views.AsyncClientPersonalizedFeed.as_view()),
+    path('api/categories/', async_views.AsyncCategoryListView.as_view()),
+    path('api/services/', async_views.AsyncServiceListView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class AsyncQueryBudgetTests(BudgetFixture):
+    def authenticate(self, user, stale=False):
+        token = super().authenticate(user, stale)
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def get(self, path, data=None):
+        return async_to_sync(self.async_client.get)(path, data, headers=self.headers)
+
+    def test_feed(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.get('/api/feed/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 3)
+        self.assertEqual(response.profile.view, 'core.async_views.AsyncClientPersonalizedFeed')
+        self.assertServerTiming(response)
+
+    def test_categories(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['name'] for c in response.json()['data']], ['Home Services'])
+
+    def test_categories_not_modified(self):
+        self.authenticate(self.client_user)
+        etag = self.get('/api/categories/')['ETag']
+        self.headers['If-None-Match'] = etag
+        with mock.patch('core.cache.get_taxonomy_version', side_effect=AssertionError('sync version read')):
+            response = self.get('/api/categories/')
+        self.assertEqual(response.status_code, 304)
+
+    def test_services(self):
+        self.authenticate(self.client_user, stale=True)
+        response = self.get('/api/services/', {'category': 'Home Services'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 3)
@@ -0,0 +1,145 @@
+"""
+Sliding-window throttles for the unauthenticated endpoints that send email or hash passwords.
+
+A view sets throttle_scope and lists the throttles to apply; each one looks up the rate
+"<scope>_ip" or "<scope>_email" in DEFAULT_THROTTLE_RATES and skips itself when none is set.
+They run in APIView.initial(), before the handler touches the database, Celery or the hasher.
+With redis each check is a single EVALSHA; otherwise the history lives in the cache.
+"""
+import hashlib
+import logging
+import re
+import secrets
+import time
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import RedisError
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from .redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+RATE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# drops the hits that left the window, records this one (unless the member is empty) if it
+# fits and otherwise returns how many milliseconds until the oldest hit leaves
+SLIDING_WINDOW = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    if ARGV[4] ~= '' then
+        redis.call('ZADD', KEYS[1], now, ARGV[4])
+        redis.call('PEXPIRE', KEYS[1], window)
+    end
+    return 0
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return tonumber(oldest[2]) + window - now
+"""
+
+
+def parse_rate(rate):
+    """'5/10m' -> (5, 600)"""
+    match = RATE.match(rate.strip())
+    if match is None:
+        raise ValueError(f"Invalid throttle rate {rate!r}, expected e.g. 5/m or 5/10m")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * UNIT_SECONDS[unit]
+
+
+def redis_hit(redis, key, limit, window, record=True):
+    now = int(time.time() * 1000)
+    # members must be unique or two hits in the same millisecond count once
+    member = f'{now}-{secrets.token_hex(4)}' if record else ''
+    wait = redis.register_script(SLIDING_WINDOW)(keys=[key], args=[now, window * 1000, limit, member])
+    return int(wait) / 1000
+
+
+def cache_hit(key, limit, window, record=True):
+    # not atomic across processes, only used when the cache is not redis (development)
+    now = time.time()
+    history = [stamp for stamp in cache.get(key, []) if stamp > now - window]
+    if len(history) >= limit:
+        return history[0] + window - now
+    if record:
+        history.append(now)
+        cache.set(key, history, window)
+    return 0
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    kind = None
+    # False leaves the recording to the view, through record_hit()
+    record_requests = True
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def _hit(self, request, view, record):
+        """Seconds to wait before the next allowed hit, 0 when allowed (and recorded if record)"""
+        if not settings.THROTTLE_ENABLED:
+            return 0
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}')
+        ident = self.get_key(request)
+        if rate is None or ident is None:
+            return 0
+
+        limit, window = parse_rate(rate)
+        key = f'throttle:{scope}:{self.kind}:{ident}'
+        redis = get_redis()
+        try:
+            if redis is not None:
+                return redis_hit(redis, key, limit, window, record)
+            return cache_hit(key, limit, window, record)
+        except RedisError as e:
+            # an unreachable redis must not lock everyone out of login
+            logger.warning(f"Throttle check failed open: {str(e)}")
+            return 0
+
+    def allow_request(self, request, view):
+        wait = self._hit(request, view, self.record_requests)
+        if wait > 0:
+            self.wait_seconds = wait
+            return False
+        return True
+
+    def record_hit(self, request, view):
+        self._hit(request, view, record=True)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    kind = 'ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+class EmailRateThrottle(SlidingWindowThrottle):
+    """Keyed by the email in the request body, so rotating IPs does not reset one account's limit"""
+    kind = 'email'
+
+    def get_key(self, request):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        # hashed so addresses are not stored in redis
+        return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+
+class FailedLoginThrottle(EmailRateThrottle):
+    """
+    Counts only the failed logins for an email, recorded by the view. Counting every attempt
+    would let anyone who knows the address lock its owner out.
+    """
+    record_requests = False
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+from .uploads import UPLOAD_KINDS, max_upload_size
+
+
+class UploadTooLarge(MultiPartParserError):
+    # a MultiPartParserError so DRF's MultiPartParser answers 400 instead of dropping the file
+    pass
+
+
+def field_size_limits():
+    return {options['field']: max_upload_size(kind) for kind, options in UPLOAD_KINDS.items()}
+
+
+class FileSizeLimitUploadHandler(FileUploadHandler):
+    """
+    First handler in FILE_UPLOAD_HANDLERS. Rejects oversized requests from the
+    Content-Length header before reading the body, and oversized files on the chunk
+    that crosses their field's cap, so nothing past the limit is spooled.
+    Chunks are passed on unchanged to the memory / temporary file handlers.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.UPLOAD_MAX_REQUEST_SIZE:
+            raise UploadTooLarge(
+                f"Request body exceeds {settings.UPLOAD_MAX_REQUEST_SIZE} bytes"
+            )
+        self.limits = field_size_limits()
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        self.limit = self.limits.get(field_name, settings.UPLOAD_MAX_DOCUMENT_SIZE)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            raise UploadTooLarge(f"{self.field_name} exceeds {self.limit} bytes")
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
@@ -0,0 +1,177 @@
+import uuid
+from PIL import Image
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.core.files.storage import default_storage
+from accounts.models import ClientProfile, ArtisanProfile
+from .models import Post
+
+IMAGE_TYPES = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp'}
+DOCUMENT_TYPES = {**IMAGE_TYPES, 'application/pdf': '.pdf'}
+
+# kind -> where the upload lands and what it may contain
+UPLOAD_KINDS = {
+    'profile_picture': {'field': 'profile_picture', 'types': IMAGE_TYPES, 'artisan_only': False},
+    'proof_of_address': {'field': 'proof_of_address', 'types': DOCUMENT_TYPES, 'artisan_only': True},
+    'certification': {'field': 'certification', 'types': DOCUMENT_TYPES, 'artisan_only': True},
+    'post_image': {'field': 'image', 'types': IMAGE_TYPES, 'artisan_only': True},
+}
+
+TICKET_SALT = 'core.uploads.ticket'
+
+
+class UploadError(Exception):
+    pass
+
+
+def get_upload_target(user, kind, object_id=None):
+    """The instance an upload of this kind attaches to, raising UploadError when there is none"""
+    if UPLOAD_KINDS[kind]['artisan_only'] and not user.is_artisan:
+        raise UploadError(f"Only artisans can upload a {kind}")
+
+    if kind == 'post_image':
+        instance = Post.objects.filter(id=object_id, artisan__user_id=user.id).first()
+    elif user.is_artisan:
+        instance = ArtisanProfile.objects.filter(user_id=user.id).first()
+    else:
+        instance = ClientProfile.objects.filter(user_id=user.id).first()
+
+    if instance is None:
+        raise UploadError("Post not found" if kind == 'post_image' else "Profile not found")
+    return instance
+
+
+def max_upload_size(kind):
+    if UPLOAD_KINDS[kind]['types'] is IMAGE_TYPES:
+        return settings.UPLOAD_MAX_IMAGE_SIZE
+    return settings.UPLOAD_MAX_DOCUMENT_SIZE
+
+
+def is_s3_storage(storage):
+    from storages.backends.s3 import S3Storage
+    return isinstance(storage, S3Storage)
+
+
+def _presigned_post(storage, key, content_type, max_size):
+    from storages.utils import clean_name
+
+    client = storage.connection.meta.client
+    return client.generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=storage._normalize_name(clean_name(key)),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_size],
+        ],
+        ExpiresIn=settings.UPLOAD_TICKET_EXPIRY,
+    )
+
+
+def create_upload_ticket(user, kind, content_type, local_url, object_id=None):
+    """
+    Reserve a storage key and return what the client needs to upload straight to storage:
+    a presigned S3 POST in production, the signed local endpoint otherwise.
+    """
+    instance = get_upload_target(user, kind, object_id)
+    extension = UPLOAD_KINDS[kind]['types'][content_type]
+    field = instance._meta.get_field(UPLOAD_KINDS[kind]['field'])
+    key = field.generate_filename(instance, f'{uuid.uuid4().hex}{extension}')
+    max_size = max_upload_size(kind)
+
+    ticket = signing.dumps({
+        'user': user.id,
+        'kind': kind,
+        'key': key,
+        'object': instance.pk,
+        'content_type': content_type,
+    }, salt=TICKET_SALT)
+
+    if is_s3_storage(default_storage):
+        post = _presigned_post(default_storage, key, content_type, max_size)
+        url, fields = post['url'], post['fields']
+    else:
+        # development storage, the file goes through LocalUploadView instead
+        url, fields = local_url, {'ticket': ticket}
+
+    return {
+        'url': url,
+        'fields': fields,
+        'ticket': ticket,
+        'key': key,
+        'max_size': max_size,
+        'expires_in': settings.UPLOAD_TICKET_EXPIRY,
+    }
+
+
+def read_ticket(ticket, user_id=None):
+    try:
+        data = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.UPLOAD_TICKET_EXPIRY)
+    except signing.BadSignature:
+        raise UploadError("Invalid or expired upload ticket")
+    if user_id is not None and data['user'] != user_id:
+        raise UploadError("Invalid or expired upload ticket")
+    return data
+
+
+def confirm_upload(user, ticket):
+    """Attach an uploaded key to its instance and queue the content check, returning the instance"""
+    from .tasks import validate_upload
+
+    data = read_ticket(ticket, user.id)
+    key, kind = data['key'], data['kind']
+
+    if not default_storage.exists(key):
+        raise UploadError("The file has not been uploaded")
+    if default_storage.size(key) > max_upload_size(kind):
+        default_storage.delete(key)
+        raise UploadError("The file is too large")
+
+    instance = get_upload_target(user, kind, data['object'] if kind == 'post_image' else None)
+    field_name = UPLOAD_KINDS[kind]['field']
+    setattr(instance, field_name, key)
+    # a plain save so the image pipeline and other post_save work run as for a multipart upload
+    instance.save(update_fields=[field_name])
+
+    label, pk = instance._meta.label, instance.pk
+    transaction.on_commit(lambda: validate_upload.delay(label, pk, key, kind))
+    return instance
+
+
+def is_valid_upload(key, kind):
+    """Check the stored bytes are what the ticket allowed, the client-declared type is not trusted"""
+    with default_storage.open(key, 'rb') as upload:
+        if UPLOAD_KINDS[kind]['types'] is DOCUMENT_TYPES and upload.read(5) == b'%PDF-':
+            return True
+        upload.seek(0)
+        try:
+            with Image.open(upload) as image:
+                image.verify()
+                return image.format in ('JPEG', 'PNG', 'WEBP')
+        except Exception:
+            return False
+
+
+def save_local_upload(ticket, upload):
+    """Development stand-in for the presigned POST, enforcing the same conditions"""
+    data = read_ticket(ticket)
+    if upload.content_type != data['content_type']:
+        raise UploadError("The file type does not match the upload ticket")
+    if upload.size > max_upload_size(data['kind']):
+        raise UploadError("The file is too large")
+    # a ticket uploads once, a replay would otherwise be stored under a renamed key
+    if default_storage.exists(data['key']):
+        raise UploadError("This upload ticket was already used")
+    name = default_storage.save(data['key'], upload)
+    if name != data['key']:
+        # lost a race with a concurrent upload of the same ticket
+        default_storage.delete(name)
+        raise UploadError("This upload ticket was already used")
+
+
+def reject_upload(instance, key, kind):
+    """Detach an invalid upload if it is still the current one, and delete it"""
+    field_name = UPLOAD_KINDS[kind]['field']
+    type(instance).objects.filter(pk=instance.pk, **{field_name: key}).update(**{field_name: ''})
+    default_storage.delete(key)
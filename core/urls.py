@@ -1,8 +1,30 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.urls import path
-from . import views
+from . import views, async_views
+from .uploads import is_s3_storage
+
+# under ASGI the read-heavy endpoints are served by native async views
+if settings.ASYNC_VIEWS:
+    feed_view = async_views.AsyncClientPersonalizedFeed
+    category_list_view = async_views.AsyncCategoryListView
+    service_list_view = async_views.AsyncServiceListView
+else:
+    feed_view = views.ClientPersonalizedFeed
+    category_list_view = views.CategoryListView
+    service_list_view = views.ServiceListView
 
 urlpatterns = [
     path("hello/", views.HelloWorldView.as_view(), name="hello_world"),
-    path("categories/", views.CategoryListView.as_view(), name="category_list"),
-    path("services/", views.ServiceListView.as_view(), name="service_list"),
-]
\ No newline at end of file
+    path("feed/", feed_view.as_view(), name="client_feed"),
+    path("artisans/<int:artisan_id>/posts/", views.ArtisanPostListView.as_view(), name="artisan_post_list"),
+    path("interactions/", views.InteractionIngestView.as_view(), name="interaction_ingest"),
+    path("uploads/tickets/", views.UploadTicketView.as_view(), name="upload_ticket"),
+    path("uploads/confirm/", views.UploadConfirmView.as_view(), name="upload_confirm"),
+    path("categories/", category_list_view.as_view(), name="category_list"),
+    path("services/", service_list_view.as_view(), name="service_list"),
+]
+
+# with S3 clients upload to a presigned POST, the local endpoint only exists for other storages
+if not is_s3_storage(default_storage):
+    urlpatterns.append(path("uploads/local/", views.LocalUploadView.as_view(), name="upload_local"))
@@ -1,12 +1,28 @@
+import hashlib
 from django.shortcuts import render
+from django.urls import reverse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from rest_framework import status
+from rest_framework.exceptions import NotFound
 from accounts.permissions import IsArtisan, IsClient
 from accounts.models import ClientProfile, ArtisanProfile
 from core.models import Post, Category, Service
-from .serializers import CategorySerializer, ServiceSerializer
+from .serializers import (
+    CategorySerializer, ServiceSerializer, PostSerializer, InteractionBatchSerializer, UploadTicketSerializer
+)
+from .feed import get_client_feed
+from .interactions import record_interactions
+from .uploads import UploadError, create_upload_ticket, confirm_upload, is_s3_storage, save_local_upload
+from .pagination import KeysetPagination
+from .cache import get_or_set_taxonomy, taxonomy_etag, taxonomy_last_modified
+from .profiling import query_budget
 
 # Create your views here.
 class HelloWorldView(APIView):
@@ -16,48 +32,137 @@ class HelloWorldView(APIView):
         return Response({"message": "Hello, World!"}, status=status.HTTP_200_OK)
 
 
+@query_budget(4)
 class ClientPersonalizedFeed(APIView):
+    permission_classes = [IsClient]
+
+    def get(self, request):
+        try:
+            profile = ClientProfile.objects.get(user_id=request.user.id)
+        except ClientProfile.DoesNotExist:
+            return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # the feed is materialized by core.feed, each page is a single indexed range scan
+        paginator = KeysetPagination(ordering=('-created_at', '-post'), page_size=settings.FEED_PAGE_SIZE)
+        entries = paginator.paginate_queryset(get_client_feed(profile), request, view=self)
+        serializer = PostSerializer([entry.post for entry in entries], many=True)
+        return paginator.get_paginated_response(serializer.data, "Feed retrieved successfully")
+
+
+@query_budget(4)
+class ArtisanPostListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, artisan_id):
+        if not ArtisanProfile.objects.filter(id=artisan_id).exists():
+            return Response({"error": "Artisan not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        posts = paginator.paginate_queryset(
+            Post.objects.filter(artisan_id=artisan_id).select_related('category').prefetch_related('tags'),
+            request, view=self
+        )
+        serializer = PostSerializer(posts, many=True)
+        return paginator.get_paginated_response(serializer.data, "Posts retrieved successfully")
+
+
+class InteractionIngestView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = InteractionBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # buffered and written by the next flush, or written now when the queue redis is missing or full
+        record_interactions(request.user.id, [
+            (event['post'], event['type']) for event in serializer.validated_data['events']
+        ])
+        return Response({
+            "message": "Interactions recorded"
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+@query_budget(2)
+class UploadTicketView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(request):
-        user = request.user
-        post = Post.objects.order_by('-created_at')
+    def post(self, request):
+        serializer = UploadTicketSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # the local endpoint is only routed when storage is not S3
+        local_url = None if is_s3_storage(default_storage) else request.build_absolute_uri(reverse('upload_local'))
+        try:
+            ticket = create_upload_ticket(
+                request.user,
+                serializer.validated_data['kind'],
+                serializer.validated_data['content_type'],
+                local_url=local_url,
+                object_id=serializer.validated_data.get('post'),
+            )
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": "Upload ticket issued, POST the file with the given fields to the url",
+            "data": ticket
+        }, status=status.HTTP_201_CREATED)
+
+
+@query_budget(8)
+class UploadConfirmView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ticket = request.data.get('ticket')
+        if not ticket:
+            return Response({"error": "ticket is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            instance = confirm_upload(request.user, ticket)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": "Upload attached, it will be checked in the background",
+            "data": {"id": instance.pk}
+        }, status=status.HTTP_200_OK)
 
-        profile = ClientProfile.objects.get(user=user)
-        preferred_categories = profile.preferred_categories.all()
-        followed_tags = profile.followed_tags.all()
 
-        # query to get clients preferred services for personalized experience
-        posts = Post.objects.filter(
-            Q(category__in=preferred_categories) | Q(tags__in=followed_tags)
-        ).distinct()
+class LocalUploadView(APIView):
+    # not routed with S3 storage, clients upload to the presigned url instead, see core/urls.py
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    parser_classes = [MultiPartParser]
 
-        # Boost posts based on interactions
-        liked_post = UserInteraction.objects.filter(
-            user=user, liked=True
-        ).values_list('post_id', flat=True)
-        posts = posts.order_by(
-            models.Case(
-                models.When(id__in=liked_posts, then=0),  # Prioritize liked posts
-                default=1,
-                output_field=models.IntegerField()
-            ),
-            '-created_at'  # Then sort by recency
-        )[:20]
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(posts, status=status.HTTP_200_OK)
+        try:
+            save_local_upload(request.data.get('ticket', ''), upload)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@query_budget(2)
 class CategoryListView(APIView):
-    permission = [IsAuthenticated,]
+    permission_classes = [IsAuthenticated,]
 
+    @method_decorator(condition(etag_func=taxonomy_etag, last_modified_func=taxonomy_last_modified))
     def get(self, request):
         try:
-            categories = Category.objects.all()
-            serializer = CategorySerializer(categories, many=True)
+            categories = get_or_set_taxonomy(
+                'categories',
+                lambda: list(CategorySerializer(Category.objects.all(), many=True).data)
+            )
             return Response({
                 "mesage": "Categories retrieved successfully",
-                "data": serializer.data
+                "data": categories
                 }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -66,9 +171,11 @@ class CategoryListView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@query_budget(3)
 class ServiceListView(APIView):
-    permission = [IsAuthenticated]
+    permission_classes = [IsAuthenticated]
 
+    @method_decorator(condition(etag_func=taxonomy_etag, last_modified_func=taxonomy_last_modified))
     def get(self, request):
         try:
 
@@ -76,20 +183,34 @@ class ServiceListView(APIView):
             services = Service.objects.all()
 
             if category:
-                if not Category.objects.filter(name=category).exists():
+                category_names = get_or_set_taxonomy(
+                    'category_names',
+                    lambda: set(Category.objects.values_list('name', flat=True))
+                )
+                if category not in category_names:
                     return Response({
                         "error": f"category '{category}' does not exist"
                     }, status=status.HTTP_400_BAD_REQUEST)
                 services  = Service.objects.filter(category__name=category)
 
+            # first pages are cached, keyed on the validated params only so other params cannot
+            # mint entries; the cached next link is relative and carries no requester's Host
+            paginator = KeysetPagination(ordering=('id',), link_params=('category',))
+            page_key = paginator.page_key(request)
 
-            serializer = ServiceSerializer(services, many=True)
-            return Response({
-                "message": "Services retrieved successfully",
-                "data": serializer.data
-            }, status=status.HTTP_200_OK)
+            def build_page():
+                page = paginator.paginate_queryset(services, request, view=self)
+                serializer = ServiceSerializer(page, many=True)
+                return paginator.get_paginated_data(serializer.data, "Services retrieved successfully")
+
+            if page_key is None:
+                return Response(build_page(), status=status.HTTP_200_OK)
+            page_hash = hashlib.md5(f'{category or ""}:{page_key}'.encode('utf-8')).hexdigest()
+            return Response(get_or_set_taxonomy(f'services:{page_hash}', build_page), status=status.HTTP_200_OK)
 
+        except NotFound:
+            raise
         except Exception as e:
             return Response(
                 {"error": f"failed to retrieve services {str(e)}"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
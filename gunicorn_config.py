@@ -1,9 +1,16 @@
-import multiprocessing
+from quickfiss import capacity
 
+# SERVER_MODE=asgi serves quickfiss.asgi:application with uvicorn workers:
+#   gunicorn --config gunicorn_config.py quickfiss.asgi:application
+# worker counts follow the CPU count, capped by memory and the Postgres connection budget
 bind = "0.0.0.0:8000"
 backlog = 2048
-workers = 2
-worker_class = "sync"
+workers = capacity.web_workers()
+if capacity.server_mode() == "asgi":
+    # one event loop per core, each keeps many requests in flight
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    worker_class = "sync"
 worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 50
@@ -17,4 +24,4 @@ preload_app = True
 worker_tmp_dir = "/dev/shm"
 limit_request_line = 4094
 limit_request_fields = 100
-limit_request_field_size = 8190
\ No newline at end of file
+limit_request_field_size = 8190
@@ -7,10 +7,36 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
+from . import capacity
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quickfiss.settings')
 
+
+class ConcurrencyLimit:
+    """
+    Let at most `limit` HTTP requests into the app at once, the rest wait their turn. Without
+    the pool each request in flight holds a database connection, this keeps a worker within
+    the share capacity.web_workers() budgeted for it.
+    """
+
+    def __init__(self, app, limit):
+        self.app = app
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        async with self.semaphore:
+            return await self.app(scope, receive, send)
+
+
 application = get_asgi_application()
+if not settings.DB_POOL:
+    # with the pool, its max_size and timeout bound the connections instead
+    application = ConcurrencyLimit(application, capacity.asgi_concurrency())
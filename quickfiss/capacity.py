@@ -0,0 +1,66 @@
+"""
+Process and connection sizing shared by gunicorn_config.py and settings.py.
+
+Every gunicorn worker and celery child holds its own Postgres connections, so the
+number of processes is capped by what fits under DB_MAX_CONNECTIONS (the server's
+max_connections, or PgBouncer's max_client_conn when DB_PGBOUNCER is set).
+Kept free of Django imports so gunicorn can load it before the app.
+"""
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+def server_mode():
+    return os.environ.get('SERVER_MODE', 'wsgi')
+
+
+def celery_concurrency():
+    return _env_int('CELERY_WORKER_CONCURRENCY', 2)
+
+
+def asgi_concurrency():
+    """Requests one ASGI worker runs at once, enforced in quickfiss/asgi.py"""
+    return _env_int('ASGI_WORKER_CONCURRENCY', 10)
+
+
+def connections_per_web_worker():
+    if _env_bool('DB_POOL'):
+        # the psycopg pool may grow to max_size in every worker process
+        return _env_int('DB_POOL_MAX_SIZE', 4)
+    if server_mode() == 'asgi':
+        # each ASGI request runs its ORM calls in a thread-sensitive context of its own, and
+        # so on its own connection: one per request in flight
+        return asgi_concurrency()
+    # sync workers handle one request at a time on one persistent connection
+    return 1
+
+
+def web_connection_budget():
+    """Connections left for the web tier once celery and maintenance are accounted for"""
+    return (
+        _env_int('DB_MAX_CONNECTIONS', 50)
+        - _env_int('DB_RESERVED_CONNECTIONS', 5)
+        - celery_concurrency()
+    )
+
+
+def web_workers():
+    if 'GUNICORN_WORKERS' in os.environ:
+        return _env_int('GUNICORN_WORKERS', 1)
+
+    cpu_count = multiprocessing.cpu_count()
+    workers = cpu_count if server_mode() == 'asgi' else cpu_count * 2 + 1
+    workers = min(
+        workers,
+        _env_int('GUNICORN_MAX_WORKERS', 4),  # sized for the 512M web container
+        web_connection_budget() // connections_per_web_worker(),
+    )
+    return max(workers, 1)
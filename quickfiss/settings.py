@@ -2,6 +2,8 @@ import environ
 import os
 from pathlib import Path
 from datetime import timedelta
+from celery.schedules import crontab
+from . import capacity
 
 # Initialize environment variables
 env = environ.Env()
@@ -11,6 +13,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 ENVIRONMENT = env('ENVIRONMENT', default='development')
 IS_PRODUCTION = ENVIRONMENT == 'production'
 
+# 'wsgi' (sync gunicorn workers) or 'asgi' (uvicorn workers), see gunicorn_config.py
+SERVER_MODE = env('SERVER_MODE', default='wsgi')
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=SERVER_MODE == 'asgi')
+
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', default=False)
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['localhost', '127.0.0.1'])
@@ -35,6 +41,7 @@ CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=['http://localho
 CORS_ALLOW_ALL_ORIGINS = False
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -45,16 +52,39 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# per-request query/latency stats and @query_budget checks, see core/profiling.py
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=DEBUG)
+QUERY_BUDGET_STRICT = env.bool('QUERY_BUDGET_STRICT', default=False)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # "<count>/<window>", e.g. 5/10m; keyed by the view's throttle_scope and the client IP or
+    # submitted email, see core/throttling.py
+    'DEFAULT_THROTTLE_RATES': {
+        'register_ip': env('THROTTLE_REGISTER_IP', default='10/h'),
+        'otp_ip': env('THROTTLE_OTP_IP', default='20/h'),
+        'otp_email': env('THROTTLE_OTP_EMAIL', default='3/10m'),
+        'login_ip': env('THROTTLE_LOGIN_IP', default='30/m'),
+        # failed logins only, see core.throttling.FailedLoginThrottle
+        'login_email': env('THROTTLE_LOGIN_EMAIL', default='10/10m'),
+    },
+    # nginx appends the client address to X-Forwarded-For
+    'NUM_PROXIES': env.int('THROTTLE_NUM_PROXIES', default=1),
 }
+THROTTLE_ENABLED = env.bool('THROTTLE_ENABLED', default=True)
+
+# Refresh token blacklist, mirrored in redis (accounts/blacklist.py) and pruned by the
+# prune_tokens maintenance job
+TOKEN_PRUNE_BATCH_SIZE = env.int('TOKEN_PRUNE_BATCH_SIZE', default=1000)
+TOKEN_BLACKLIST_BATCH_SIZE = env.int('TOKEN_BLACKLIST_BATCH_SIZE', default=1000)
+TOKEN_BLACKLIST_LOAD_TIMEOUT = env.int('TOKEN_BLACKLIST_LOAD_TIMEOUT', default=600)
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15) if IS_PRODUCTION else timedelta(days=1),
@@ -72,6 +102,8 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.RoleTokenRefreshSerializer',
 }
 
 AUTH_USER_MODEL = 'core.User'
@@ -95,8 +127,18 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'quickfiss.wsgi.application'
+ASGI_APPLICATION = 'quickfiss.asgi.application'
 
 # Database
+# Persistent connections with health checks by default. DB_POOL switches to psycopg 3's
+# built-in pool (requires psycopg[pool] in place of psycopg2-binary), DB_PGBOUNCER makes
+# the connection safe behind PgBouncer in transaction pooling mode.
+DB_POOL = env.bool('DB_POOL', default=False)
+DB_PGBOUNCER = env.bool('DB_PGBOUNCER', default=False)
+# under ASGI every request opens its own connection (see quickfiss/capacity.py), persistent
+# ones would stay open per request thread, so they are closed after each request instead
+DB_CONN_MAX_AGE = 0 if DB_POOL or SERVER_MODE == 'asgi' else env.int('DB_CONN_MAX_AGE', default=60)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql' if IS_PRODUCTION else 'django.db.backends.sqlite3',
@@ -105,9 +147,22 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD', default='') if IS_PRODUCTION else '',
         'HOST': env('DB_HOST', default='localhost') if IS_PRODUCTION else '',
         'PORT': env('DB_PORT', default='5432') if IS_PRODUCTION else '',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # server-side cursors do not survive transaction pooling
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
     }
 }
 
+if IS_PRODUCTION and DB_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=1),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=4),
+            'timeout': env.int('DB_POOL_TIMEOUT', default=10),
+        },
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -115,6 +170,29 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Password hashing, the first hasher of the profile hashes new passwords and stored hashes
+# are upgraded to it on login, see accounts/hashers.py. Compare profiles and costs with
+# `manage.py benchmark_password_hashers` before changing them.
+PASSWORD_HASH_PROFILES = {
+    'argon2': [
+        'accounts.hashers.TunedArgon2PasswordHasher',
+        'accounts.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+    'pbkdf2': [
+        'accounts.hashers.TunedPBKDF2PasswordHasher',
+        'accounts.hashers.TunedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+}
+PASSWORD_HASH_PROFILE = env('PASSWORD_HASH_PROFILE', default='argon2')
+PASSWORD_HASHERS = PASSWORD_HASH_PROFILES[PASSWORD_HASH_PROFILE]
+# Argon2id defaults are the OWASP minimum (19 MiB, 2 passes, 1 lane)
+PASSWORD_ARGON2_TIME_COST = env.int('PASSWORD_ARGON2_TIME_COST', default=2)
+PASSWORD_ARGON2_MEMORY_COST = env.int('PASSWORD_ARGON2_MEMORY_COST', default=19456)
+PASSWORD_ARGON2_PARALLELISM = env.int('PASSWORD_ARGON2_PARALLELISM', default=1)
+PASSWORD_PBKDF2_ITERATIONS = env.int('PASSWORD_PBKDF2_ITERATIONS', default=870000)
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -130,17 +208,42 @@ AWS_S3_USE_SSL = env.bool('AWS_S3_USE_SSL', default=True)
 AWS_S3_VERIFY = env.bool('AWS_S3_VERIFY', default=True)
 AWS_S3_CUSTOM_DOMAIN = f'{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com'
 
+# Django 5.1 only reads storage backends from STORAGES
 if IS_PRODUCTION:
     STATIC_URL = f'{AWS_S3_URL_PROTOCOL}://{AWS_S3_CUSTOM_DOMAIN}/static/'
-    STATICFILES_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
     MEDIA_URL = f'{AWS_S3_URL_PROTOCOL}://{AWS_S3_CUSTOM_DOMAIN}/media/'
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    STORAGES = {
+        'default': {'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage'},
+        'staticfiles': {'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage'},
+    }
 else:
     STATIC_URL = '/static/'
     STATICFILES_DIRS = [BASE_DIR / 'static']
-    STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }
+
+# Direct uploads, see core/uploads.py
+UPLOAD_TICKET_EXPIRY = env.int('UPLOAD_TICKET_EXPIRY', default=15 * 60)
+UPLOAD_MAX_IMAGE_SIZE = env.int('UPLOAD_MAX_IMAGE_SIZE', default=10 * 1024 * 1024)
+UPLOAD_MAX_DOCUMENT_SIZE = env.int('UPLOAD_MAX_DOCUMENT_SIZE', default=20 * 1024 * 1024)
+
+# Multipart uploads through the API, size caps are checked while streaming (core/upload_handlers.py)
+UPLOAD_MAX_REQUEST_SIZE = env.int('UPLOAD_MAX_REQUEST_SIZE', default=32 * 1024 * 1024)
+FILE_UPLOAD_HANDLERS = [
+    'core.upload_handlers.FileSizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# bodies above this spool to FILE_UPLOAD_TEMP_DIR in chunks instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = env.int('FILE_UPLOAD_MAX_MEMORY_SIZE', default=1024 * 1024)
+# /dev/shm avoids disk IO but counts against the container memory limit
+FILE_UPLOAD_TEMP_DIR = env('FILE_UPLOAD_TEMP_DIR', default=None)
+# images larger than this are rejected from their header, before any pixel is decoded
+IMAGE_MAX_PIXELS = env.int('IMAGE_MAX_PIXELS', default=40_000_000)
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -149,10 +252,112 @@ REDIS_HOST = env('REDIS_HOST', default='redis')
 REDIS_PORT = env('REDIS_PORT', default=6379)
 REDIS_DB = env('REDIS_DB', default=0)
 CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
+# work that must survive memory pressure (queued mail, buffered interactions) goes to a
+# separate noeviction redis, the default one evicts with allkeys-lru. Empty disables it.
+QUEUE_REDIS_URL = env('QUEUE_REDIS_URL', default='redis://redis_queue:6379/0' if IS_PRODUCTION else '')
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# each prefork child holds a database connection, see quickfiss/capacity.py
+CELERY_WORKER_CONCURRENCY = capacity.celery_concurrency()
+# periodic tasks, run by the single celery_beat service in docker-compose.yml
+CELERY_BEAT_SCHEDULE = {
+    'prune-expired-tokens': {
+        'task': 'core.tasks.run_maintenance',
+        'schedule': timedelta(minutes=env.int('TOKEN_PRUNE_INTERVAL_MINUTES', default=60)),
+        'args': ('prune_tokens',),
+    },
+    'prune-otps': {
+        'task': 'core.tasks.run_maintenance',
+        'schedule': timedelta(hours=1),
+        'args': ('prune_otps',),
+    },
+    'prune-interactions': {
+        'task': 'core.tasks.run_maintenance',
+        'schedule': crontab(hour=3, minute=0),
+        'args': ('prune_interactions',),
+    },
+    'recompute-ratings': {
+        'task': 'core.tasks.run_maintenance',
+        'schedule': crontab(hour=4, minute=0),
+        'args': ('recompute_ratings',),
+    },
+    'warm-caches': {
+        'task': 'core.tasks.run_maintenance',
+        'schedule': timedelta(minutes=10),
+        'args': ('warm_caches',),
+    },
+    'ensure-email-drain': {
+        'task': 'accounts.tasks.ensure_email_drain',
+        'schedule': timedelta(minutes=1),
+    },
+    'ensure-interaction-flush': {
+        'task': 'core.tasks.ensure_interaction_flush',
+        'schedule': timedelta(minutes=1),
+    },
+}
+
+# Maintenance jobs, see core/maintenance.py. A run stops after MAINTENANCE_TIME_BUDGET
+# seconds and continues MAINTENANCE_CONTINUE_DELAY seconds later from where it stopped.
+MAINTENANCE_BATCH_SIZE = env.int('MAINTENANCE_BATCH_SIZE', default=1000)
+MAINTENANCE_BATCH_PAUSE = env.float('MAINTENANCE_BATCH_PAUSE', default=0.1)
+MAINTENANCE_TIME_BUDGET = env.int('MAINTENANCE_TIME_BUDGET', default=120)
+MAINTENANCE_CONTINUE_DELAY = env.int('MAINTENANCE_CONTINUE_DELAY', default=10)
+# longer than the time budget plus one batch
+MAINTENANCE_LOCK_TIMEOUT = env.int('MAINTENANCE_LOCK_TIMEOUT', default=600)
+INTERACTION_RETENTION_DAYS = env.int('INTERACTION_RETENTION_DAYS', default=365)
+
+# Cache, django-redis in production and per-process memory elsewhere unless CACHE_URL says so
+CACHES = {
+    'default': env.cache(
+        'CACHE_URL',
+        default=f'redis://{REDIS_HOST}:{REDIS_PORT}/1' if IS_PRODUCTION else 'locmemcache://',
+    ),
+}
+TAXONOMY_CACHE_TIMEOUT = env.int('TAXONOMY_CACHE_TIMEOUT', default=60 * 60 * 24)
+TAXONOMY_REGISTRY_TTL = env.int('TAXONOMY_REGISTRY_TTL', default=60)
+
+# Personalized feed
+FEED_PAGE_SIZE = env.int('FEED_PAGE_SIZE', default=20)
+FEED_MAX_ENTRIES = env.int('FEED_MAX_ENTRIES', default=500)
+FEED_BATCH_SIZE = env.int('FEED_BATCH_SIZE', default=1000)
+# clients per ranking query when a fan-out trims feeds back to FEED_MAX_ENTRIES
+FEED_TRIM_BATCH_SIZE = env.int('FEED_TRIM_BATCH_SIZE', default=100)
+
+# Nearby artisan lookup
+NEARBY_DEFAULT_RADIUS_KM = env.float('NEARBY_DEFAULT_RADIUS_KM', default=10.0)
+NEARBY_MAX_RADIUS_KM = env.float('NEARBY_MAX_RADIUS_KM', default=50.0)
+NEARBY_MAX_RESULTS = env.int('NEARBY_MAX_RESULTS', default=50)
+
+# Artisan ratings, a Bayesian average pulling small samples towards the prior mean
+RATING_PRIOR_MEAN = env.float('RATING_PRIOR_MEAN', default=3.5)
+RATING_PRIOR_WEIGHT = env.int('RATING_PRIOR_WEIGHT', default=5)
+RATING_REBUILD_BATCH_SIZE = env.int('RATING_REBUILD_BATCH_SIZE', default=1000)
+
+# Uploaded image variants, see core/images.py
+POST_IMAGE_WIDTHS = env.list('POST_IMAGE_WIDTHS', cast=int, default=[320, 640, 1080])
+AVATAR_IMAGE_WIDTHS = env.list('AVATAR_IMAGE_WIDTHS', cast=int, default=[96, 192, 384])
+IMAGE_MAX_DIMENSION = env.int('IMAGE_MAX_DIMENSION', default=2048)
+IMAGE_WEBP_QUALITY = env.int('IMAGE_WEBP_QUALITY', default=80)
+IMAGE_JPEG_QUALITY = env.int('IMAGE_JPEG_QUALITY', default=82)
+IMAGE_LQIP_WIDTH = env.int('IMAGE_LQIP_WIDTH', default=16)
+
+# Interaction ingestion, events are buffered and upserted by core.tasks.flush_interactions
+INTERACTION_FLUSH_INTERVAL = env.int('INTERACTION_FLUSH_INTERVAL', default=5)
+INTERACTION_FLUSH_SCHEDULE_TIMEOUT = env.int('INTERACTION_FLUSH_SCHEDULE_TIMEOUT', default=60)
+INTERACTION_BATCH_SIZE = env.int('INTERACTION_BATCH_SIZE', default=1000)
+# one flush at a time, a flush still running after this long may be joined by another
+INTERACTION_FLUSH_LOCK_TIMEOUT = env.int('INTERACTION_FLUSH_LOCK_TIMEOUT', default=300)
+INTERACTION_MAX_EVENTS = env.int('INTERACTION_MAX_EVENTS', default=100)
+
+# One-time codes for signup and password reset, kept in redis with a TTL, see accounts/otp.py
+OTP_LENGTH = env.int('OTP_LENGTH', default=6)
+OTP_TTL = env.int('OTP_TTL', default=600)
+OTP_MAX_ATTEMPTS = env.int('OTP_MAX_ATTEMPTS', default=5)
+# failures per user and purpose across reissued codes, verification is refused past it
+OTP_MAX_FAILURES = env.int('OTP_MAX_FAILURES', default=15)
+OTP_FAILURE_WINDOW = env.int('OTP_FAILURE_WINDOW', default=60 * 60)
 
 # Email
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend' if IS_PRODUCTION else 'django.core.mail.backends.console.EmailBackend'
@@ -162,6 +367,13 @@ EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=True)
 EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='webmaster@quickfiss.com')
+# queued mail is drained in batches over one SMTP connection, see accounts/mail.py
+EMAIL_BATCH_SIZE = env.int('EMAIL_BATCH_SIZE', default=50)
+EMAIL_RETRY_BACKOFF = env.int('EMAIL_RETRY_BACKOFF', default=30)
+EMAIL_RETRY_BACKOFF_MAX = env.int('EMAIL_RETRY_BACKOFF_MAX', default=900)
+EMAIL_DRAIN_SCHEDULE_TIMEOUT = env.int('EMAIL_DRAIN_SCHEDULE_TIMEOUT', default=300)
+# one drain at a time, a drain still running after this long may be joined by another
+EMAIL_DRAIN_LOCK_TIMEOUT = env.int('EMAIL_DRAIN_LOCK_TIMEOUT', default=600)
 
 # Security for production
 if IS_PRODUCTION:
@@ -204,5 +416,10 @@ LOGGING = {
             'level': 'INFO' if IS_PRODUCTION else 'DEBUG',
             'propagate': True,
         },
+        'core.profiling': {
+            'handlers': ['file', 'console'] if IS_PRODUCTION else ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file